@@ -0,0 +1,204 @@
+"""
+Local benchmark for the PDF processing paths
+
+Runs the processing functions from main.py directly (no HTTP) so timings
+reflect the work itself; they run in the worker pool as the endpoints run
+them. The fastpath benchmark is the exception: the difference it measures is
+in the request handling, so it goes through the endpoints with an in-process
+test client. The throughput benchmark starts real servers with 1..N web
+workers and measures requests per second.
+
+Usage:
+    python benchmark.py compress large.pdf [--quality medium] [--runs 3] [--shards N]
+    python benchmark.py fastpath small.pdf [--operation compress] [--runs 20]
+    python benchmark.py throughput small.pdf [--operation compress] [--workers 1,2,4] [--requests 60]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+
+
+def time_runs(label, runs, fn):
+    """Run fn() `runs` times and print the median wall-clock time"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    print(f"{label:<28} median {median:8.3f}s  (runs: {', '.join(f'{t:.3f}' for t in timings)})")
+    return median
+
+
+def benchmark_compress(args):
+    """Compare the single-process and sharded compression paths"""
+    settings = main.COMPRESSION_QUALITY_SETTINGS[args.quality]
+    page_count, image_sizes = main.inspect_pdf_images(args.pdf)
+    file_size = os.path.getsize(args.pdf)
+    shard_count = args.shards or max(
+        2, main.get_shard_count(page_count, file_size, len(image_sizes), sum(image_sizes.values()))
+    )
+
+    print(f"File: {args.pdf} ({file_size / 1024 / 1024:.1f} MB, {page_count} pages)")
+    print(f"Quality: {args.quality}, shards: {shard_count}, processes: {main.COMPRESS_MAX_PROCESSES}")
+
+    single_path = tempfile.mktemp(suffix='_compressed.pdf')
+    sharded_path = tempfile.mktemp(suffix='_compressed.pdf')
+    try:
+        # Start the worker processes before timing
+        main.get_process_pool().submit(time.sleep, 0).result()
+
+        # Both paths run as pool jobs, like the endpoint runs them
+        single = time_runs("single process", args.runs,
+                           lambda: main.wait_for_job(*main.submit_job(main.compress_pdf_file, args.pdf, single_path, settings), "single"))
+        sharded = time_runs(f"sharded ({shard_count} shards)", args.runs,
+                            lambda: main.compress_pdf_sharded(args.pdf, sharded_path, settings, shard_count))
+
+        print(f"Output size: single {os.path.getsize(single_path)} bytes, sharded {os.path.getsize(sharded_path)} bytes")
+        print(f"Speedup: {single / sharded:.2f}x")
+    finally:
+        main.cleanup_temp_files(single_path, sharded_path)
+        main.get_process_pool().shutdown()
+
+
+def benchmark_fastpath(args):
+    """Compare request latency of the in-memory and disk paths for a small file"""
+    from fastapi.testclient import TestClient
+
+    file_size = os.path.getsize(args.pdf)
+    with open(args.pdf, 'rb') as f:
+        content = f.read()
+    endpoint = f"/api/{args.operation}"
+    print(f"File: {args.pdf} ({file_size / 1024:.0f} KB), endpoint: {endpoint}")
+
+    def post(client):
+        response = client.post(endpoint, files={"file": (os.path.basename(args.pdf), content, "application/pdf")})
+        response.raise_for_status()
+
+    inmemory_max_bytes = main.INMEMORY_MAX_BYTES
+    try:
+        with TestClient(main.app) as client:
+            # Start the worker processes before timing
+            post(client)
+
+            main.INMEMORY_MAX_BYTES = 0
+            disk = time_runs("disk (temp files)", args.runs, lambda: post(client))
+            main.INMEMORY_MAX_BYTES = max(file_size, inmemory_max_bytes)
+            memory = time_runs("in memory", args.runs, lambda: post(client))
+    finally:
+        main.INMEMORY_MAX_BYTES = inmemory_max_bytes
+        main.get_process_pool().shutdown()
+
+    print(f"Latency saved: {(disk - memory) * 1000:.1f} ms per request ({disk / memory:.2f}x)")
+
+
+def free_port():
+    """A TCP port that is free right now"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, state_db_path):
+    """Start uvicorn with `workers` web workers and wait until it answers"""
+    import httpx
+
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), STATE_DB_PATH=state_db_path)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/health", timeout=1).raise_for_status()
+            return server, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server with {workers} workers did not start")
+
+
+def benchmark_throughput(args):
+    """Requests per second with 1..N web workers, to check that throughput scales with workers"""
+    import httpx
+
+    with open(args.pdf, 'rb') as f:
+        content = f.read()
+    endpoint = f"/api/{args.operation}"
+    worker_counts = [int(count) for count in args.workers.split(",")]
+    print(f"File: {args.pdf} ({len(content) / 1024:.0f} KB), endpoint: {endpoint}, "
+          f"{args.requests} requests per run, CPUs: {os.cpu_count()}")
+
+    def post(client):
+        response = client.post(endpoint, files={"file": (os.path.basename(args.pdf), content, "application/pdf")})
+        response.raise_for_status()
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as state_dir:
+        for workers in worker_counts:
+            server, base_url = start_server(workers, os.path.join(state_dir, f"state_{workers}.sqlite3"))
+            # Enough clients to keep every worker busy
+            concurrency = args.concurrency or 4 * workers
+            try:
+                with httpx.Client(base_url=base_url, timeout=300) as client, \
+                        ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    # Start the worker processes before timing
+                    list(executor.map(lambda _: post(client), range(concurrency)))
+
+                    start = time.perf_counter()
+                    list(executor.map(lambda _: post(client), range(args.requests)))
+                    elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait()
+
+            throughput = args.requests / elapsed
+            baseline = baseline or throughput / workers
+            print(f"{workers} worker(s), {concurrency} clients: {throughput:8.2f} req/s  "
+                  f"(scaling efficiency {throughput / (baseline * workers):.0%})")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark PDF processing paths")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compress_parser = subparsers.add_parser("compress", help="single-process vs sharded compression")
+    compress_parser.add_argument("pdf")
+    compress_parser.add_argument("--quality", default="medium", choices=sorted(main.COMPRESSION_QUALITY_SETTINGS))
+    compress_parser.add_argument("--runs", type=int, default=3)
+    compress_parser.add_argument("--shards", type=int, default=0, help="shard count (default: automatic)")
+    compress_parser.set_defaults(func=benchmark_compress)
+
+    fastpath_parser = subparsers.add_parser("fastpath", help="in-memory vs disk path for small files")
+    fastpath_parser.add_argument("pdf")
+    fastpath_parser.add_argument("--operation", default="compress", choices=["compress", "convert", "ocr"])
+    fastpath_parser.add_argument("--runs", type=int, default=20)
+    fastpath_parser.set_defaults(func=benchmark_fastpath)
+
+    throughput_parser = subparsers.add_parser("throughput", help="requests per second with 1..N web workers")
+    throughput_parser.add_argument("pdf")
+    throughput_parser.add_argument("--operation", default="compress", choices=["compress", "convert", "ocr", "analyze"])
+    throughput_parser.add_argument("--workers", default="1,2,4", help="comma-separated web worker counts")
+    throughput_parser.add_argument("--requests", type=int, default=60)
+    throughput_parser.add_argument("--concurrency", type=int, default=0, help="parallel clients (default: 4 per worker)")
+    throughput_parser.set_defaults(func=benchmark_throughput)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is preloaded in the master: LibreOffice/Pandoc detection, the shared
+state database and the heavy imports happen once, before the workers are
+forked. Each worker then starts its own scheduler on startup, and only the
+worker holding the maintenance lock runs the cleanup jobs.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# main.py sizes its per-worker process pools from the worker count; the
+# config is read before the app is preloaded, so this is visible at import
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Conversions of large files can take minutes
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
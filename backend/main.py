@@ -3,13 +3,16 @@ Professional PDF Tools API
 Provides high-quality conversion and processing for PDF files
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, BackgroundTasks
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, BackgroundTasks, Header, Depends, Request
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pdf2docx import Converter
+from pdf2docx.converter import ConversionException, MakedocxException
+from docx import Document
 import tempfile
 import os
 import io
+from urllib.parse import quote
 import logging
 from pathlib import Path
 import subprocess
@@ -20,11 +23,244 @@ from PIL import Image
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 import glob
+import hashlib
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import time
+import signal
+import threading
+import zipfile
+import sqlite3
+import json
+import uuid
+import fcntl
+import sys
+import hmac
+import random
+import contextvars
+import asyncio
+import resource
+import multiprocessing
+from collections import Counter, deque
+from contextlib import contextmanager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared state for multi-worker deployments (gunicorn / uvicorn --workers):
+# counters, caches and job state live in one SQLite file that every worker
+# process on the host opens
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(tempfile.gettempdir(), "pdf_tools_state.sqlite3"))
+MAINTENANCE_LOCK_PATH = os.getenv("MAINTENANCE_LOCK_PATH", os.path.join(tempfile.gettempdir(), "pdf_tools_maintenance.lock"))
+
+_state_local = threading.local()
+
+def get_state_db():
+    """
+    SQLite connection for the current thread
+
+    Connections are never reused across a fork: a child process opens its
+    own on first use.
+    """
+    connection = getattr(_state_local, "connection", None)
+    if connection is not None and _state_local.pid == os.getpid():
+        return connection
+
+    connection = sqlite3.connect(STATE_DB_PATH, timeout=10, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL);
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            operation TEXT NOT NULL,
+            status TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+    _state_local.connection = connection
+    _state_local.pid = os.getpid()
+    return connection
+
+def increment_counter(name, amount=1):
+    """Add to a shared counter"""
+    get_state_db().execute(
+        "INSERT INTO counters (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+        (name, amount)
+    )
+
+def get_counters():
+    """All shared counters as a dict"""
+    return dict(get_state_db().execute("SELECT name, value FROM counters ORDER BY name"))
+
+def cache_get(key, refresh_ttl=None):
+    """
+    Read a JSON value from the shared cache, or None if missing or expired
+
+    refresh_ttl (seconds) slides the expiry forward on a hit.
+    """
+    connection = get_state_db()
+    row = connection.execute(
+        "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+        (key, time.time())
+    ).fetchone()
+    if row is None:
+        return None
+    if refresh_ttl is not None:
+        connection.execute("UPDATE cache SET expires_at = ? WHERE key = ?", (time.time() + refresh_ttl, key))
+    return json.loads(row[0])
+
+def cache_set(key, value, ttl=None):
+    """Write a JSON value to the shared cache; ttl in seconds, None = no expiry"""
+    expires_at = time.time() + ttl if ttl is not None else None
+    get_state_db().execute(
+        "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+        (key, json.dumps(value), expires_at)
+    )
+
+def update_shared_state(key, default, update):
+    """
+    Read-modify-write a shared JSON value atomically across workers
+
+    Returns:
+        The new value
+    """
+    connection = get_state_db()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        value = update(json.loads(row[0]) if row else default)
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, NULL)",
+            (key, json.dumps(value))
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return value
+
+# Writes made while handling requests run on one writer thread per process:
+# a write can wait up to the connection timeout for another worker's lock,
+# which must not block the event loop. One thread keeps the writes in order,
+# so a job's start, cancellation and finish are applied in that order.
+_state_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-writer")
+
+def log_state_write_error(future):
+    """Done callback: log a queued write that failed"""
+    if future.exception() is not None:
+        logger.error(f"Shared state write failed: {future.exception()}")
+
+def queue_state_write(fn, *args):
+    """Run fn(*args) on the writer thread without waiting for it"""
+    try:
+        future = _state_writer.submit(fn, *args)
+    except RuntimeError:
+        # Writer already shut down: the process is exiting
+        fn(*args)
+        return
+    future.add_done_callback(log_state_write_error)
+
+def start_job(operation):
+    """Register a running job in the shared job table and return its id"""
+    job_id = uuid.uuid4().hex
+    queue_state_write(write_job_start, job_id, operation, os.getpid(), time.time())
+    return job_id
+
+def write_job_start(job_id, operation, pid, started_at):
+    """Writer thread part of start_job"""
+    get_state_db().execute(
+        "INSERT INTO jobs (id, operation, status, pid, started_at, updated_at) VALUES (?, ?, 'running', ?, ?, ?)",
+        (job_id, operation, pid, started_at, started_at)
+    )
+    increment_counter(f"{operation}.started")
+
+def finish_job(job_id, status):
+    """
+    Mark a job done, failed or cancelled and update the per-operation counters
+
+    For cancelled jobs the time spent is also added to
+    {operation}.cancelled_seconds: work done for a client that left.
+    """
+    queue_state_write(write_job_finish, job_id, status, time.time())
+
+def write_job_finish(job_id, status, finished_at):
+    """Writer thread part of finish_job"""
+    connection = get_state_db()
+    row = connection.execute("SELECT operation, started_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return
+
+    operation, started_at = row
+    connection.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, finished_at, job_id))
+    increment_counter(f"{operation}.{status}")
+    increment_counter(f"{operation}.seconds", finished_at - started_at)
+    if status == "cancelled":
+        increment_counter(f"{operation}.cancelled_seconds", finished_at - started_at)
+
+def cancel_job(job_id):
+    """Ask a running job to stop; its workers see this through is_job_cancelled"""
+    queue_state_write(write_job_cancel, job_id, time.time())
+
+def write_job_cancel(job_id, cancelled_at):
+    """Writer thread part of cancel_job"""
+    get_state_db().execute(
+        "UPDATE jobs SET status = 'cancelling', updated_at = ? WHERE id = ? AND status = 'running'",
+        (cancelled_at, job_id)
+    )
+
+def is_job_cancelled(job_id):
+    """
+    Whether cancel_job was called for a job
+
+    A job that already finished counts as cancelled too: cancel_job is often
+    followed at once by finish_job, and no one waits for the remaining work.
+    """
+    row = get_state_db().execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row is not None and row[0] != "running"
+
+def prune_shared_state(max_job_age=timedelta(days=1)):
+    """Drop expired cache entries and old finished jobs"""
+    connection = get_state_db()
+    connection.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+    # Jobs of a worker that died mid-request never finish
+    connection.execute(
+        "UPDATE jobs SET status = 'abandoned', updated_at = ? WHERE status IN ('running', 'cancelling') AND started_at < ?",
+        (time.time(), time.time() - 3600)
+    )
+    connection.execute(
+        "DELETE FROM jobs WHERE status != 'running' AND updated_at < ?",
+        (time.time() - max_job_age.total_seconds(),)
+    )
+
+def detect_once(name, probe):
+    """
+    Run a startup probe once per host instead of once per worker
+
+    The result is shared through the state cache for an hour, so workers
+    started by uvicorn --workers (or restarted by gunicorn) skip the probe.
+    """
+    key = f"detect:{name}"
+    try:
+        cached = cache_get(key)
+    except sqlite3.Error as e:
+        logger.warning(f"Shared state unavailable, probing {name} directly: {e}")
+        return probe()
+
+    if cached is not None:
+        return cached["value"]
+
+    value = probe()
+    cache_set(key, {"value": value}, ttl=3600)
+    return value
+
 # Find LibreOffice executable path
 def find_libreoffice():
     """Find LibreOffice executable in common locations"""
@@ -64,9 +300,9 @@ def check_pandoc():
         logger.warning("Pandoc not found")
     return False
 
-# Get LibreOffice path on startup
-LIBREOFFICE_PATH = find_libreoffice()
-PANDOC_AVAILABLE = check_pandoc()
+# Get LibreOffice path on startup (once per host, see detect_once)
+LIBREOFFICE_PATH = detect_once("libreoffice", find_libreoffice)
+PANDOC_AVAILABLE = detect_once("pandoc", check_pandoc)
 
 app = FastAPI(
     title="Professional PDF Tools API",
@@ -92,6 +328,562 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling. A request is profiled when it carries
+# "X-Profile: 1" together with a valid X-Admin-Token, or when it is picked by
+# PROFILE_SAMPLE_RATE. Profiles hold only stack samples and request metadata
+# (operation, page count, stage timings), never file content or filenames.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "pdf_tools_profiles"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "200"))
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+class SamplingProfiler:
+    """
+    Samples the call stack of one thread at a fixed interval
+
+    Stacks are counted as tuples of "function (file:line)" labels, root
+    first, which maps directly onto collapsed-stack and speedscope output.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class RequestProfile:
+    """Samples and metadata collected while profiling one request"""
+
+    def __init__(self, method, path):
+        self.id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.operation = path.rstrip("/").rsplit("/", 1)[-1]
+        self.page_count = None
+        self.stages = {}
+        self.status_code = None
+        self.sampler = SamplingProfiler()
+        self.started_at = time.time()
+        self.duration = None
+
+    def add_stacks(self, stacks, prefix):
+        """Merge stacks sampled elsewhere (e.g. in a worker process) under a prefix frame"""
+        for stack, count in stacks.items():
+            self.sampler.stacks[(prefix,) + tuple(stack)] += count
+
+def profiling_active():
+    """Whether the current request is being profiled"""
+    return _active_profile.get() is not None
+
+def annotate_profile(**metadata):
+    """Attach metadata (e.g. page_count) to the current request's profile, if any"""
+    profile = _active_profile.get()
+    if profile is not None:
+        for key, value in metadata.items():
+            setattr(profile, key, value)
+
+@contextmanager
+def profile_stage(name):
+    """Time a processing stage; recorded only while a request is profiled"""
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages[name] = round(profile.stages.get(name, 0) + time.perf_counter() - started_at, 4)
+
+def is_admin_token(token):
+    """Constant-time check of an admin token; admin access is off without ADMIN_TOKEN"""
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def should_profile_request(scope):
+    """Decide from the ASGI scope whether to profile a request"""
+    if not scope["path"].startswith("/api/"):
+        return False
+
+    headers = dict(scope["headers"])
+    if headers.get(b"x-profile") == b"1":
+        return is_admin_token(headers.get(b"x-admin-token", b"").decode("latin-1"))
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def profile_to_speedscope(profile):
+    """Speedscope JSON document with the request metadata attached"""
+    frame_index = {}
+    frames = []
+    samples = []
+    weights = []
+    for stack, count in profile.sampler.stacks.items():
+        sample = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            sample.append(frame_index[label])
+        samples.append(sample)
+        weights.append(count * profile.sampler.interval * 1000)
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{profile.method} {profile.path}",
+        "exporter": "pdf-tools-api",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": profile.operation,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }],
+        "metadata": profile_metadata(profile)
+    }
+
+def profile_metadata(profile):
+    """Summary of a stored profile for the admin listing"""
+    return {
+        "id": profile.id,
+        "operation": profile.operation,
+        "path": profile.path,
+        "status_code": profile.status_code,
+        "page_count": profile.page_count,
+        "stages": profile.stages,
+        "duration_seconds": round(profile.duration, 4),
+        "samples": sum(profile.sampler.stacks.values()),
+        "interval_ms": profile.sampler.interval * 1000,
+        "created_at": datetime.fromtimestamp(profile.started_at).isoformat(timespec="seconds")
+    }
+
+def save_profile(profile):
+    """Write a profile to PROFILE_DIR, keeping only the newest PROFILE_MAX_STORED"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_path = os.path.join(PROFILE_DIR, f"{profile.id}.json")
+    with open(profile_path, "w") as f:
+        json.dump(profile_to_speedscope(profile), f)
+    logger.info(f"Stored profile {profile.id} ({profile.operation}, {profile.duration:.2f}s)")
+
+    stored = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")))
+    for old_path in stored[:-PROFILE_MAX_STORED]:
+        cleanup_temp_files(old_path)
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles selected requests
+
+    Unprofiled requests are passed straight through, so the cost when
+    profiling is off is one header lookup per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile_request(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.sampler.stop()
+            profile.duration = time.time() - profile.started_at
+            _active_profile.reset(token)
+            try:
+                save_profile(profile)
+            except Exception as e:
+                logger.error(f"Failed to store profile {profile.id}: {e}")
+
+app.add_middleware(ProfilingMiddleware)
+
+# Every PDF operation runs as a job in a pool of worker processes under
+# per-job limits: a wall-clock deadline, CPU time and address space. A job
+# that hits a limit is stopped with JobLimitExceeded and its pool is
+# recycled; workers are also replaced after JOB_MAX_TASKS_PER_WORKER jobs so
+# memory fragmentation does not build up.
+JOB_DEADLINE_SECONDS = int(os.getenv("JOB_DEADLINE_SECONDS", "240"))
+JOB_CPU_SECONDS = int(os.getenv("JOB_CPU_SECONDS", "300"))
+JOB_MEMORY_MB = int(os.getenv("JOB_MEMORY_MB", "2048"))  # 0 = no address space limit
+JOB_MAX_TASKS_PER_WORKER = int(os.getenv("JOB_MAX_TASKS_PER_WORKER", "50"))
+JOB_KILL_GRACE_SECONDS = 10  # Time a job gets to stop itself before its worker is killed
+JOB_CANCEL_POLL_SECONDS = 0.5  # How often disconnects and cancellations are checked
+
+class OperationCancelled(Exception):
+    """Raised when work is abandoned before it finished"""
+
+class JobLimitExceeded(BaseException):
+    """
+    A job ran past its deadline, CPU time or memory limit
+
+    Derives from BaseException so the per-image and per-page error handlers
+    (here and inside pdf2docx) cannot swallow it and keep the job running.
+    """
+
+    def __init__(self, limit):
+        super().__init__(limit)
+        self.limit = limit
+
+class WorkerCrashed(Exception):
+    """A worker process died while running a job"""
+
+JOB_LIMIT_ERRORS = {
+    "deadline": (504, "Processing took longer than the {seconds} second limit"),
+    "cpu": (422, "Document is too complex to process (CPU time limit exceeded)"),
+    "memory": (422, "Document is too complex to process (memory limit exceeded)")
+}
+
+def job_error_response(error):
+    """HTTPException for a job that hit a limit or lost its worker"""
+    if isinstance(error, JobLimitExceeded):
+        status_code, detail = JOB_LIMIT_ERRORS[error.limit]
+        return HTTPException(status_code=status_code, detail=detail.format(seconds=JOB_DEADLINE_SECONDS))
+    return HTTPException(status_code=503, detail="Processing worker failed, please try again")
+
+_job_limit_hit = None
+
+def _raise_job_limit(signum, frame):
+    global _job_limit_hit
+    _job_limit_hit = "cpu" if signum == signal.SIGXCPU else "deadline"
+    raise JobLimitExceeded(_job_limit_hit)
+
+def init_job_worker(memory_limit_bytes):
+    """Worker process initializer: address space limit and limit signal handlers"""
+    if memory_limit_bytes:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, hard))
+    signal.signal(signal.SIGXCPU, _raise_job_limit)
+    signal.signal(signal.SIGALRM, _raise_job_limit)
+
+def is_memory_error(error):
+    """Whether an exception is a failed allocation (MuPDF reports these as generic errors)"""
+    message = str(error).lower()
+    return isinstance(error, MemoryError) or any(
+        text in message for text in ("alloc (", "out of memory", "can't start new thread")
+    )
+
+# Set in a worker process while its current job is cancelled; long loops
+# call check_cancelled between units of work
+_job_cancelled = threading.Event()
+# Held while a watcher acts on a cancellation and while a job is marked
+# finished, so a late watcher cannot touch the worker's next job
+_job_cancel_lock = threading.Lock()
+
+def check_cancelled():
+    """Raise OperationCancelled if the current job was cancelled"""
+    if _job_cancelled.is_set():
+        raise OperationCancelled("job cancelled")
+
+def kill_child_processes():
+    """Kill this process's subprocesses (Tesseract, pdftoppm) so blocking calls return (Linux only)"""
+    for children_path in glob.glob(f"/proc/{os.getpid()}/task/*/children"):
+        try:
+            with open(children_path) as f:
+                child_pids = [int(pid) for pid in f.read().split()]
+        except OSError:
+            continue
+        for pid in child_pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+def watch_job_cancellation(job_id, job_finished):
+    """Worker thread: poll the job table until the job finishes or is cancelled"""
+    while not job_finished.wait(JOB_CANCEL_POLL_SECONDS):
+        try:
+            cancelled = is_job_cancelled(job_id)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not check job {job_id} for cancellation: {e}")
+            continue
+        if cancelled:
+            with _job_cancel_lock:
+                # The job may have finished while the query ran
+                if not job_finished.is_set():
+                    _job_cancelled.set()
+                    kill_child_processes()
+            return
+
+def run_limited_job(fn, args, deadline, cpu_seconds, profiled, job_id=None):
+    """
+    Run fn(*args) inside a worker process under the per-job limits
+
+    RLIMIT_CPU counts the whole process lifetime, so the soft limit is set
+    relative to the CPU time this worker has already used. A limit that was
+    hit is reported even if a library caught the exception raised for it,
+    and so is a cancellation of job_id (see watch_job_cancellation).
+    When profiled, the job runs under its own RequestProfile and the samples,
+    stage timings and page count travel back with the result.
+
+    Returns:
+        Tuple of (fn result, profile data or None)
+    """
+    global _job_limit_hit
+    _job_limit_hit = None
+    _job_cancelled.clear()
+    job_finished = threading.Event()
+    if job_id is not None:
+        threading.Thread(
+            target=watch_job_cancellation, args=(job_id, job_finished), name="job-cancellation", daemon=True
+        ).start()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    cpu_soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+    if cpu_hard != resource.RLIM_INFINITY:
+        cpu_soft = min(cpu_soft, cpu_hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_soft, cpu_hard))
+    signal.setitimer(signal.ITIMER_REAL, deadline)
+
+    profile = RequestProfile("JOB", fn.__name__) if profiled else None
+    token = _active_profile.set(profile)
+    result = error = None
+    try:
+        if profile is not None:
+            profile.sampler.start()
+        result = fn(*args)
+    except JobLimitExceeded:
+        pass
+    except Exception as e:
+        if is_memory_error(e):
+            _job_limit_hit = _job_limit_hit or "memory"
+        elif type(e).__module__ == "builtins":
+            error = e
+        else:
+            # Library exceptions may hold objects that cannot be sent back to the parent
+            error = RuntimeError(str(e))
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+        with _job_cancel_lock:
+            job_finished.set()
+        if profile is not None:
+            profile.sampler.stop()
+        _active_profile.reset(token)
+
+    # Raised out here, once the failed job's frames (and the memory they hold) are released
+    if _job_cancelled.is_set():
+        raise OperationCancelled("job cancelled")
+    if _job_limit_hit:
+        raise JobLimitExceeded(_job_limit_hit)
+    if error is not None:
+        raise error
+    if profile is None:
+        return result, None
+    return result, {
+        "stacks": [[list(stack), count] for stack, count in profile.sampler.stacks.items()],
+        "stages": profile.stages,
+        "page_count": profile.page_count
+    }
+
+_process_pool = None
+# Guards creating, replacing and submitting to the pool: jobs are submitted
+# from the event loop and from threads (sharded compression)
+_process_pool_lock = threading.RLock()
+
+def get_process_pool():
+    """
+    Return the shared worker process pool, creating it on first use
+
+    Workers come from a forkserver that has main.py preloaded, because the
+    fork start method does not support replacing workers after N tasks.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+            _process_pool = ProcessPoolExecutor(
+                max_workers=COMPRESS_MAX_PROCESSES,
+                mp_context=context,
+                initializer=init_job_worker,
+                initargs=(JOB_MEMORY_MB * 1024 * 1024,),
+                max_tasks_per_child=JOB_MAX_TASKS_PER_WORKER
+            )
+            # Futures of the jobs not finished yet, see kill_stuck_workers
+            _process_pool.job_futures = set()
+            logger.info(f"Started process pool with {COMPRESS_MAX_PROCESSES} workers")
+        return _process_pool
+
+def warm_process_pool():
+    """Start the pool's worker processes now so the first job does not wait for the forkserver"""
+    pool = get_process_pool()
+    # The executor starts one worker per pending task, up to max_workers
+    for _ in range(COMPRESS_MAX_PROCESSES):
+        pool.submit(os.getpid)
+
+def recycle_process_pool(pool, stuck_future=None):
+    """
+    Replace a pool after a limit violation or a crashed worker
+
+    New jobs go to a new pool and the jobs still running on the old one
+    finish normally. stuck_future is a job stuck in native code that ignores
+    its deadline, whose worker has to be killed, see kill_stuck_workers.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+    if stuck_future is not None:
+        threading.Thread(
+            target=kill_stuck_workers, args=(pool, stuck_future), name="pool-reaper", daemon=True
+        ).start()
+    logger.warning("Recycled worker process pool")
+
+def kill_stuck_workers(pool, stuck_future):
+    """
+    Kill the workers of a recycled pool once its other jobs are done
+
+    Any worker dying makes ProcessPoolExecutor fail every job of its pool,
+    so killing the stuck worker right away would fail unrelated requests.
+    By the time the other jobs are done, the stuck job is the only one left.
+    """
+    other_jobs = [future for future in pool.job_futures.copy() if future is not stuck_future]
+    wait(other_jobs, timeout=JOB_DEADLINE_SECONDS + JOB_KILL_GRACE_SECONDS)
+    if stuck_future.done():
+        return
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    logger.warning("Killed the workers of a recycled pool with a stuck job")
+
+def submit_job(fn, *args, job_id=None):
+    """
+    Submit fn(*args) to the worker pool under the per-job limits
+
+    With job_id the job stops early once cancel_job(job_id) is called.
+    """
+    with _process_pool_lock:
+        pool = get_process_pool()
+        future = pool.submit(
+            run_limited_job, fn, args, JOB_DEADLINE_SECONDS, JOB_CPU_SECONDS, profiling_active(), job_id
+        )
+    pool.job_futures.add(future)
+    future.add_done_callback(pool.job_futures.discard)
+    return pool, future
+
+def finish_job_result(outcome, label, merge_stages=True):
+    """Unpack a job outcome, merging profile data into the current request's profile"""
+    result, profile_data = outcome
+    profile = _active_profile.get()
+    if profile is not None and profile_data is not None:
+        profile.add_stacks({tuple(stack): count for stack, count in profile_data["stacks"]}, f"[{label} process]")
+        for stage, seconds in (profile_data["stages"].items() if merge_stages else ()):
+            profile.stages[stage] = round(profile.stages.get(stage, 0) + seconds, 4)
+        if profile_data["page_count"] is not None and profile.page_count is None:
+            profile.page_count = profile_data["page_count"]
+    return result
+
+def wait_for_job(pool, future, label, merge_stages=True):
+    """Block until a submitted job finishes, enforcing the deadline from this side too"""
+    try:
+        outcome = future.result(timeout=JOB_DEADLINE_SECONDS + JOB_KILL_GRACE_SECONDS)
+    except FuturesTimeoutError:
+        recycle_process_pool(pool, stuck_future=future)
+        raise JobLimitExceeded("deadline")
+    except JobLimitExceeded:
+        recycle_process_pool(pool)
+        raise
+    except BrokenProcessPool:
+        recycle_process_pool(pool)
+        raise WorkerCrashed(label)
+    return finish_job_result(outcome, label, merge_stages)
+
+async def run_job(fn, *args, job_id=None):
+    """Run fn(*args) in the worker pool without blocking the event loop"""
+    pool, future = submit_job(fn, *args, job_id=job_id)
+    try:
+        outcome = await asyncio.wait_for(
+            asyncio.wrap_future(future),
+            JOB_DEADLINE_SECONDS + JOB_KILL_GRACE_SECONDS
+        )
+    except asyncio.TimeoutError:
+        recycle_process_pool(pool, stuck_future=future)
+        raise JobLimitExceeded("deadline")
+    except JobLimitExceeded:
+        recycle_process_pool(pool)
+        raise
+    except BrokenProcessPool:
+        recycle_process_pool(pool)
+        raise WorkerCrashed(fn.__name__)
+    return finish_job_result(outcome, fn.__name__)
+
+async def cancel_on_disconnect(request, job_id, work, cancel_event=None):
+    """
+    Await work for a request, cancelling job_id if the client disconnects first
+
+    Work running in the worker pool sees the cancellation through the job
+    table; work running in threads of this process gets cancel_event set.
+    The cancelled work is still awaited, so its temp files can be cleaned
+    up and its time counted, before OperationCancelled is raised.
+    """
+    task = asyncio.ensure_future(work)
+    while not task.done():
+        await asyncio.wait({task}, timeout=JOB_CANCEL_POLL_SECONDS)
+        if task.done() or not await request.is_disconnected():
+            continue
+
+        logger.info(f"Client disconnected, cancelling job {job_id}")
+        cancel_job(job_id)
+        if cancel_event is not None:
+            cancel_event.set()
+        try:
+            await task
+        except (Exception, JobLimitExceeded):
+            pass
+        raise OperationCancelled(f"job {job_id} cancelled")
+    return task.result()
+
+def limit_subprocess(pid):
+    """Apply the per-job CPU limit to an external converter process (Linux only)"""
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CPU, (JOB_CPU_SECONDS, JOB_CPU_SECONDS + 5))
+    except (AttributeError, ProcessLookupError, OSError) as e:
+        logger.debug(f"Could not limit subprocess {pid}: {e}")
+
 # Scheduled cleanup job for orphaned temp files
 def cleanup_orphaned_temp_files():
     """
@@ -131,23 +923,244 @@ def cleanup_orphaned_temp_files():
     except Exception as e:
         logger.error(f"Scheduled cleanup failed: {e}")
 
-# Initialize scheduler
+_maintenance_lock = None
+
+def is_maintenance_leader():
+    """
+    Whether this worker runs periodic maintenance
+
+    The first worker to take the lock on MAINTENANCE_LOCK_PATH becomes the
+    leader and keeps the lock until it exits; the others retry on every
+    maintenance run, so a new leader takes over if the old one dies. POSIX
+    record locks are not inherited across fork, so child processes never
+    hold it.
+    """
+    global _maintenance_lock
+    if _maintenance_lock is not None:
+        return True
+
+    lock_file = open(MAINTENANCE_LOCK_PATH, 'a')
+    try:
+        fcntl.lockf(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+
+    _maintenance_lock = lock_file
+    logger.info(f"Worker {os.getpid()} is the maintenance leader")
+    return True
+
+def run_maintenance():
+    """Periodic maintenance, executed only by the elected leader worker"""
+    if not is_maintenance_leader():
+        return
+
+    cleanup_orphaned_temp_files()
+    try:
+        prune_shared_state()
+    except sqlite3.Error as e:
+        logger.error(f"Pruning shared state failed: {e}")
+
+# Initialize scheduler; it is started per worker on startup, never at import
+# time, so a preloading master (gunicorn --preload) forks workers without it
 scheduler = BackgroundScheduler()
 scheduler.add_job(
-    cleanup_orphaned_temp_files,
+    run_maintenance,
     'interval',
     hours=1,
     id='cleanup_temp_files',
     replace_existing=True
 )
-scheduler.start()
+
+@app.on_event("startup")
+def startup_event():
+    scheduler.start()
+    is_maintenance_leader()
+    warm_process_pool()
+    logger.info(f"Worker {os.getpid()} started")
 
 # Shutdown scheduler on app exit
 @app.on_event("shutdown")
 def shutdown_event():
-    scheduler.shutdown()
+    if scheduler.running:
+        scheduler.shutdown()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+    # Apply the queued shared-state writes before the worker exits
+    _state_writer.shutdown(wait=True)
     logger.info("Scheduler shut down")
 
+# Document profiles built by /api/analyze, cached by content hash in the
+# shared state so the follow-up processing request can reuse them on any worker
+PROFILE_CACHE_TTL = 3600  # seconds since last use
+
+IMAGE_FILTER_TYPES = {
+    "/DCTDecode": "jpeg",
+    "/JPXDecode": "jpx",
+    "/FlateDecode": "flate",
+    "/CCITTFaxDecode": "ccitt",
+    "/JBIG2Decode": "jbig2",
+    "/LZWDecode": "lzw",
+    "/RunLengthDecode": "rle"
+}
+COMPRESSIBLE_IMAGE_TYPES = ("jpeg", "flate", "raw", "lzw", "rle")
+
+# Share of compressible image bytes left after the image stage, per quality,
+# and share of font bytes left after subsetting
+COMPRESS_IMAGE_RETAINED = {"low": 0.15, "medium": 0.3, "high": 0.55}
+FONT_SUBSET_RETAINED = 0.3
+
+# Per-operation cost models: seconds = (base + per_page * pages + per_mb * MB) * scale
+# The coefficients are starting values; scale is recalibrated after every
+# completed job as a moving average of actual / predicted time, and shared
+# between workers
+OPERATION_COST_MODELS = {
+    "compress": {"base": 0.3, "per_page": 0.03, "per_mb": 0.12},
+    "ocr": {"base": 0.5, "per_page": 2.0, "per_mb": 0.0},
+    "convert": {"base": 0.8, "per_page": 0.5, "per_mb": 0.05}
+}
+COST_MODEL_SMOOTHING = 0.2
+
+def content_hash(content):
+    """SHA-256 of uploaded file content, used as the profile cache key"""
+    return hashlib.sha256(content).hexdigest()
+
+def get_cached_profile(digest):
+    """Return the cached profile for a content hash, or None"""
+    return cache_get(f"profile:{digest}", refresh_ttl=PROFILE_CACHE_TTL)
+
+def cache_profile(digest, profile):
+    """Store a profile; unused profiles expire after PROFILE_CACHE_TTL"""
+    queue_state_write(cache_set, f"profile:{digest}", profile, PROFILE_CACHE_TTL)
+    queue_state_write(cache_set, f"profile_size:{profile['file_size']}", True, PROFILE_CACHE_TTL)
+
+def find_cached_profile(content):
+    """
+    Cached profile of uploaded content, or None
+
+    Hashing a large upload costs more than the profile saves, so the content
+    is only hashed when a profile of a file with the same size is cached.
+    """
+    if cache_get(f"profile_size:{len(content)}") is None:
+        return None
+    return get_cached_profile(content_hash(content))
+
+def stream_length(pdf_document, xref):
+    """Stored (still encoded) size of a stream object"""
+    value_type, value = pdf_document.xref_get_key(xref, "Length")
+    if value_type == "int":
+        return int(value)
+    return len(pdf_document.xref_stream_raw(xref) or b"")
+
+def image_type(pdf_document, xref):
+    """Short image type name from the last filter of an image stream"""
+    value_type, value = pdf_document.xref_get_key(xref, "Filter")
+    if value_type == "name":
+        return IMAGE_FILTER_TYPES.get(value, value.lstrip("/").lower())
+    if value_type == "array":
+        filters = value.strip("[]").replace("/", " /").split()
+        if filters:
+            return IMAGE_FILTER_TYPES.get(filters[-1], filters[-1].lstrip("/").lower())
+    return "raw"
+
+def page_text_coverage(page, textpage=None):
+    """Fraction of the page area covered by text blocks (0 = no text layer)"""
+    page_area = abs(page.rect)
+    if not page_area:
+        return 0.0
+
+    text_area = 0.0
+    for block in page.get_text("blocks", textpage=textpage):
+        if block[6] == 0 and block[4].strip():
+            text_area += abs(fitz.Rect(block[:4]) & page.rect)
+    return round(min(text_area / page_area, 1.0), 4)
+
+def build_document_profile(pdf_document, file_size):
+    """
+    Profile a PDF from its structure only
+
+    Reads the object table, page resources and text layer; no image is
+    decoded and nothing is rendered.
+    """
+    pages = []
+    image_pages = {}
+    for page in pdf_document:
+        page_images = page.get_images(full=True)
+        for img in page_images:
+            image_pages.setdefault(img[0], set()).add(page.number)
+        pages.append({
+            "page": page.number + 1,
+            "text_coverage": page_text_coverage(page),
+            "images": len(page_images)
+        })
+
+    images_by_type = {}
+    for xref in image_pages:
+        entry = images_by_type.setdefault(image_type(pdf_document, xref), {"count": 0, "bytes": 0})
+        entry["count"] += 1
+        entry["bytes"] += stream_length(pdf_document, xref)
+
+    stream_count = sum(
+        1 for xref in range(1, pdf_document.xref_length()) if pdf_document.xref_is_stream(xref)
+    )
+
+    return {
+        "file_size": file_size,
+        "page_count": len(pdf_document),
+        "text_layer_pages": sum(1 for page in pages if page["text_coverage"] > 0),
+        "pages": pages,
+        "images": {
+            "count": len(image_pages),
+            "bytes": sum(entry["bytes"] for entry in images_by_type.values()),
+            "by_type": images_by_type
+        },
+        "xrefs": {
+            "objects": pdf_document.xref_length() - 1,
+            "streams": stream_count,
+            "unique_images": len(image_pages),
+            "image_references": sum(page["images"] for page in pages),
+            "shared_images": sum(1 for page_numbers in image_pages.values() if len(page_numbers) > 1)
+        },
+        "font_bytes": embedded_font_bytes(pdf_document)
+    }
+
+def estimate_compress_savings(profile, quality, structural=True):
+    """Rough bytes saved by /api/compress for a profiled document"""
+    retained = COMPRESS_IMAGE_RETAINED.get(quality, COMPRESS_IMAGE_RETAINED["medium"])
+    image_bytes = sum(
+        entry["bytes"] for name, entry in profile["images"]["by_type"].items()
+        if name in COMPRESSIBLE_IMAGE_TYPES
+    )
+    savings = image_bytes * (1 - retained)
+    if structural:
+        savings += profile["font_bytes"] * (1 - FONT_SUBSET_RETAINED)
+    return int(min(savings, profile["file_size"]))
+
+def estimate_operation_seconds(operation, page_count, file_size, scale=None):
+    """Predicted processing time for an operation from its cost model"""
+    model = OPERATION_COST_MODELS[operation]
+    if scale is None:
+        scale = cache_get(f"cost_scale:{operation}") or 1.0
+    megabytes = file_size / (1024 * 1024)
+    return (model["base"] + model["per_page"] * page_count + model["per_mb"] * megabytes) * scale
+
+def record_operation_timing(operation, page_count, file_size, seconds):
+    """Recalibrate an operation's cost model with a measured job duration"""
+    predicted = estimate_operation_seconds(operation, page_count, file_size, scale=1.0)
+    if predicted <= 0:
+        return
+
+    ratio = min(max(seconds / predicted, 0.1), 10.0)
+    queue_state_write(write_cost_model_scale, operation, ratio, page_count, seconds)
+
+def write_cost_model_scale(operation, ratio, page_count, seconds):
+    """Writer thread part of record_operation_timing"""
+    scale = update_shared_state(
+        f"cost_scale:{operation}", 1.0,
+        lambda scale: (1 - COST_MODEL_SMOOTHING) * scale + COST_MODEL_SMOOTHING * ratio
+    )
+    logger.info(f"{operation} took {seconds:.2f}s for {page_count} pages (cost model scale {scale:.2f})")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -159,15 +1172,124 @@ async def root():
             "pdf_to_word": "/api/convert",
             "word_to_pdf": "/api/word-to-pdf",
             "ocr": "/api/ocr",
-            "compress": "/api/compress"
+            "compress": "/api/compress",
+            "analyze": "/api/analyze",
+            "extract_text": "/api/extract-text"
         }
     }
 
+# Uploads up to INMEMORY_MAX_BYTES skip the temp files: the bytes are sent to
+# the job, opened with fitz.open(stream=...) and the result comes back as
+# bytes that are returned directly. Larger uploads use the disk path, which
+# does not hold the input and output in memory twice.
+INMEMORY_MAX_BYTES = int(os.getenv("INMEMORY_MAX_MB", "2")) * 1024 * 1024
+
+def open_pdf_source(source):
+    """Open a PDF given as bytes or as a file path"""
+    return fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+
+def attachment_response(content, media_type, filename, headers=None):
+    """Response for an in-memory result, with the Content-Disposition FileResponse would set"""
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        disposition = f"attachment; filename*=utf-8''{quoted_filename}"
+    else:
+        disposition = f'attachment; filename="{filename}"'
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": disposition, **(headers or {})}
+    )
+
+class CancellableConverter(Converter):
+    """pdf2docx Converter that checks for cancellation between pages"""
+
+    def parse_pages(self, **kwargs):
+        # Pages are handed to the base class one at a time so its per-page
+        # error handling still applies; that handler would swallow the
+        # OperationCancelled, so the check runs out here
+        pages = [page for page in self.pages if not page.skip_parsing]
+        try:
+            for page in pages:
+                page.skip_parsing = True
+            for page in pages:
+                check_cancelled()
+                page.skip_parsing = False
+                super().parse_pages(**kwargs)
+                page.skip_parsing = True
+        finally:
+            for page in pages:
+                page.skip_parsing = False
+        return self
+
+    def make_docx(self, filename_or_stream=None, **kwargs):
+        # Same loop as the base class, which has no per-page hook; the check
+        # runs outside its per-page handler for the same reason as above
+        parsed_pages = [page for page in self._pages if page.finalized]
+        if not parsed_pages:
+            raise ConversionException("No parsed pages. Please parse page first.")
+        if not filename_or_stream:
+            raise ConversionException("Please specify a docx file name or a file-like object to write.")
+
+        docx_file = Document()
+        for page in parsed_pages:
+            check_cancelled()
+            try:
+                page.make_docx(docx_file)
+            except Exception as e:
+                if not kwargs["debug"] and kwargs["ignore_page_error"]:
+                    logger.error(f"Ignoring page {page.id + 1}, could not create it: {e}")
+                else:
+                    raise MakedocxException(f"Error when make page {page.id + 1}: {e}")
+        docx_file.save(filename_or_stream)
+
+def convert_with_pdf2docx(cv, docx_file):
+    """
+    Convert all pages of an open Converter and close it
+
+    Args:
+        cv: CancellableConverter for the PDF
+        docx_file: Output path or file-like object
+
+    Returns:
+        Number of pages in the PDF
+    """
+    try:
+        page_count = len(cv.fitz_doc)
+        annotate_profile(page_count=page_count)
+        with profile_stage("convert"):
+            cv.convert(docx_file)
+    finally:
+        cv.close()
+    return page_count
+
+def convert_pdf_file(pdf_path, docx_path):
+    """
+    Convert a PDF file to DOCX with pdf2docx (runs as a job)
+
+    Returns:
+        Number of pages in the PDF
+    """
+    return convert_with_pdf2docx(CancellableConverter(pdf_path), docx_path)
+
+def convert_pdf_bytes(content):
+    """
+    Convert an in-memory PDF to DOCX without touching the disk (runs as a job)
+
+    Returns:
+        Tuple of (DOCX bytes, number of pages)
+    """
+    docx_buffer = io.BytesIO()
+    page_count = convert_with_pdf2docx(CancellableConverter(stream=content), docx_buffer)
+    return docx_buffer.getvalue(), page_count
+
 @app.post("/api/convert")
-async def convert_pdf_to_word(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def convert_pdf_to_word(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Convert PDF to Word document
 
+    Files up to INMEMORY_MAX_BYTES are converted without temp files.
+
     Args:
         file: PDF file to convert
 
@@ -183,51 +1305,351 @@ async def convert_pdf_to_word(background_tasks: BackgroundTasks, file: UploadFil
 
     logger.info(f"Converting PDF: {file.filename}")
 
-    # Create temporary files
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
-        # Read and save PDF
-        content = await file.read()
+    content = await file.read()
 
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
+    if len(content) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
 
-        pdf_temp.write(content)
-        pdf_path = pdf_temp.name
+    in_memory = len(content) <= INMEMORY_MAX_BYTES
+    pdf_path = docx_path = None
+    if not in_memory:
+        # Create temporary files
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
+            pdf_temp.write(content)
+            pdf_path = pdf_temp.name
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as docx_temp:
-        docx_path = docx_temp.name
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as docx_temp:
+            docx_path = docx_temp.name
+
+    job_id = start_job("convert")
 
     try:
         # Convert PDF to DOCX using pdf2docx
-        logger.info(f"Starting conversion: {pdf_path} -> {docx_path}")
+        logger.info(f"Starting conversion: {'in memory' if in_memory else f'{pdf_path} -> {docx_path}'}")
+        started_at = time.perf_counter()
 
-        cv = Converter(pdf_path)
-        cv.convert(docx_path)
-        cv.close()
+        if in_memory:
+            docx_content, page_count = await cancel_on_disconnect(
+                request, job_id, run_job(convert_pdf_bytes, content, job_id=job_id)
+            )
+        else:
+            page_count = await cancel_on_disconnect(
+                request, job_id, run_job(convert_pdf_file, pdf_path, docx_path, job_id=job_id)
+            )
+
+        record_operation_timing("convert", page_count, len(content), time.perf_counter() - started_at)
 
         logger.info(f"Conversion successful: {file.filename}")
 
         # Generate output filename
         output_filename = file.filename.rsplit('.', 1)[0] + '.docx'
+        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+        if in_memory:
+            finish_job(job_id, "done")
+            return attachment_response(docx_content, media_type, output_filename)
 
         # Schedule cleanup after response is sent
         background_tasks.add_task(cleanup_temp_files, pdf_path, docx_path)
 
         # Return the converted file
+        finish_job(job_id, "done")
+
         return FileResponse(
             path=docx_path,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            media_type=media_type,
             filename=output_filename
         )
 
+    except OperationCancelled:
+        finish_job(job_id, "cancelled")
+        logger.info(f"Conversion cancelled: {file.filename}")
+        cleanup_temp_files(pdf_path, docx_path)
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+    except (JobLimitExceeded, WorkerCrashed) as e:
+        finish_job(job_id, "failed")
+        logger.error(f"Conversion stopped: {file.filename} ({e!r})")
+        cleanup_temp_files(pdf_path, docx_path)
+        raise job_error_response(e)
+
     except Exception as e:
+        finish_job(job_id, "failed")
         logger.error(f"Conversion failed: {str(e)}")
         # Clean up on error
         cleanup_temp_files(pdf_path, docx_path)
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
 
+# Word to PDF engine routing for engine=auto: engines are ranked per document
+# from cheap DOCX features and a running latency/failure history per engine
+WORD_ENGINES = ("libreoffice", "pandoc")
+WORD_CONVERSION_TIMEOUT = 60  # seconds per engine attempt
+WORD_HEDGE_MAX_BYTES = int(os.getenv("WORD_HEDGE_MAX_KB", "512")) * 1024  # Run both engines at once below this size
+ENGINE_FAILURE_PENALTY = 30.0  # Seconds a failed attempt is assumed to cost
+ENGINE_HISTORY_SMOOTHING = 0.2
+
+# Running history per engine, seeded with typical values and shared between
+# workers (see get_engine_stats)
+ENGINE_STATS = {
+    "libreoffice": {"seconds_per_page": 0.4, "startup_seconds": 2.0, "failure_rate": 0.02, "runs": 0},
+    "pandoc": {"seconds_per_page": 0.8, "startup_seconds": 1.0, "failure_rate": 0.15, "runs": 0}
+}
+
+def docx_features(docx_path):
+    """
+    Cheap structural features of a Word document, read from the DOCX zip
+    without rendering it. Legacy .doc files are not zip archives and only
+    report their format.
+    """
+    features = {"format": "docx", "tables": 0, "images": 0, "pages": 1}
+    try:
+        with zipfile.ZipFile(docx_path) as docx_zip:
+            names = docx_zip.namelist()
+            features["images"] = sum(1 for name in names if name.startswith("word/media/"))
+            if "word/document.xml" in names:
+                document_xml = docx_zip.read("word/document.xml")
+                features["tables"] = document_xml.count(b"<w:tbl>")
+            if "docProps/app.xml" in names:
+                match = re.search(rb"<Pages>(\d+)</Pages>", docx_zip.read("docProps/app.xml"))
+                if match:
+                    features["pages"] = max(1, int(match.group(1)))
+    except zipfile.BadZipFile:
+        features["format"] = "doc"
+    return features
+
+def get_engine_stats(engine):
+    """Current shared history for an engine"""
+    return cache_get(f"engine_stats:{engine}") or ENGINE_STATS[engine]
+
+def estimate_engine_cost(engine, features):
+    """Expected seconds for an engine, including the cost of likely failure"""
+    stats = get_engine_stats(engine)
+    seconds = stats["startup_seconds"] + stats["seconds_per_page"] * features["pages"]
+    failure_rate = stats["failure_rate"]
+
+    if engine == "pandoc":
+        # pdflatex loses image placement and slows down sharply on long documents,
+        # but lays out simple tables well
+        if features["images"]:
+            failure_rate = min(1.0, failure_rate + 0.1 + 0.02 * features["images"])
+        if features["pages"] > 20:
+            seconds *= 1.5
+        if features["tables"] and not features["images"]:
+            seconds *= 0.8
+
+    return seconds + failure_rate * ENGINE_FAILURE_PENALTY
+
+def choose_word_engines(features):
+    """Available engines for a document, cheapest expected cost first"""
+    engines = []
+    if LIBREOFFICE_PATH:
+        engines.append("libreoffice")
+    if PANDOC_AVAILABLE and features["format"] == "docx":
+        engines.append("pandoc")
+    return sorted(engines, key=lambda engine: estimate_engine_cost(engine, features))
+
+def record_engine_result(engine, seconds, pages, succeeded):
+    """Fold one conversion attempt into the engine's running history"""
+    alpha = ENGINE_HISTORY_SMOOTHING
+
+    def update(stats):
+        stats["runs"] += 1
+        stats["failure_rate"] = (1 - alpha) * stats["failure_rate"] + alpha * (0.0 if succeeded else 1.0)
+        if succeeded:
+            per_page = max(seconds - stats["startup_seconds"], 0.0) / max(pages, 1)
+            stats["seconds_per_page"] = (1 - alpha) * stats["seconds_per_page"] + alpha * per_page
+        return stats
+
+    update_shared_state(f"engine_stats:{engine}", dict(ENGINE_STATS[engine]), update)
+
+def run_engine_command(command, timeout, cancel_event=None):
+    """
+    Run a converter subprocess in its own process group
+
+    The whole group is killed on timeout or when cancel_event is set, so
+    LibreOffice's soffice.bin child does not outlive the wrapper script.
+    The per-job CPU limit is applied too (no memory limit: LibreOffice
+    reserves far more address space than it uses).
+
+    Returns:
+        Completed process return code and stderr
+    """
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True
+    )
+    limit_subprocess(process.pid)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, stderr = process.communicate(timeout=0.2)
+            return process.returncode, stderr
+        except subprocess.TimeoutExpired:
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            if not cancelled and time.monotonic() < deadline:
+                continue
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.communicate()
+            if cancelled:
+                raise OperationCancelled(f"{command[0]} cancelled")
+            raise subprocess.TimeoutExpired(command, timeout)
+
+def convert_docx_with_pandoc(docx_path, pdf_path, cancel_event=None):
+    """Convert with Pandoc (pdflatex)"""
+    logger.info(f"Converting with Pandoc: {docx_path} -> {pdf_path}")
+
+    returncode, stderr = run_engine_command([
+        'pandoc',
+        docx_path,
+        '-o', pdf_path,
+        '--pdf-engine=pdflatex',
+        '-V', 'geometry:margin=1in'
+    ], WORD_CONVERSION_TIMEOUT, cancel_event)
+
+    if returncode != 0:
+        logger.warning(f"Pandoc conversion failed: {stderr}")
+        raise Exception(f"Pandoc conversion failed: {stderr}")
+
+def convert_docx_with_libreoffice(docx_path, pdf_path, cancel_event=None):
+    """Convert with LibreOffice in headless mode"""
+    logger.info(f"Converting with LibreOffice: {docx_path} -> {pdf_path}")
+
+    # Use LibreOffice headless mode for conversion with better quality settings
+    returncode, stderr = run_engine_command([
+        LIBREOFFICE_PATH,
+        '--headless',
+        '--convert-to', 'pdf:writer_pdf_Export',
+        '--outdir', os.path.dirname(pdf_path),
+        docx_path
+    ], WORD_CONVERSION_TIMEOUT, cancel_event)
+
+    if returncode != 0:
+        raise Exception(f"LibreOffice conversion failed: {stderr}")
+
+    # LibreOffice creates file with original name, need to rename
+    libreoffice_output = os.path.join(
+        os.path.dirname(pdf_path),
+        os.path.basename(docx_path).rsplit('.', 1)[0] + '.pdf'
+    )
+
+    if os.path.exists(libreoffice_output) and libreoffice_output != pdf_path:
+        os.rename(libreoffice_output, pdf_path)
+
+    if not os.path.exists(pdf_path) or os.path.getsize(pdf_path) == 0:
+        raise Exception("LibreOffice conversion produced no output")
+
+WORD_ENGINE_CONVERTERS = {
+    "libreoffice": convert_docx_with_libreoffice,
+    "pandoc": convert_docx_with_pandoc
+}
+
+def run_word_engine(engine, docx_path, pages, cancel_event=None):
+    """
+    Convert with one engine into its own output file and record the attempt
+
+    Returns:
+        Path of the engine's PDF output
+    """
+    engine_pdf_path = tempfile.mktemp(suffix=f'_{engine}.pdf')
+    started_at = time.perf_counter()
+    try:
+        WORD_ENGINE_CONVERTERS[engine](docx_path, engine_pdf_path, cancel_event)
+    except OperationCancelled:
+        cleanup_temp_files(engine_pdf_path)
+        raise
+    except Exception:
+        record_engine_result(engine, time.perf_counter() - started_at, pages, succeeded=False)
+        cleanup_temp_files(engine_pdf_path)
+        raise
+    record_engine_result(engine, time.perf_counter() - started_at, pages, succeeded=True)
+    return engine_pdf_path
+
+def convert_word_sequential(engines, docx_path, pages, attempts, cancel_event=None):
+    """
+    Try engines in order, falling back to the next one on failure
+
+    Appends (engine, seconds, outcome) to attempts. Setting cancel_event
+    kills the running engine and skips the rest.
+
+    Returns:
+        Tuple of (winning engine, PDF path)
+    """
+    last_error = None
+    for engine in engines:
+        started_at = time.perf_counter()
+        try:
+            engine_pdf_path = run_word_engine(engine, docx_path, pages, cancel_event)
+            attempts.append((engine, time.perf_counter() - started_at, "ok"))
+            return engine, engine_pdf_path
+        except OperationCancelled:
+            attempts.append((engine, time.perf_counter() - started_at, "cancelled"))
+            raise
+        except Exception as e:
+            attempts.append((engine, time.perf_counter() - started_at, "failed"))
+            logger.warning(f"{engine} failed, {'falling back' if engine != engines[-1] else 'no engines left'}: {e}")
+            last_error = e
+    raise last_error
+
+def convert_word_hedged(engines, docx_path, pages, attempts, cancel_event=None):
+    """
+    Run all engines at once and keep the first successful result
+
+    The slower engine is killed as soon as one succeeds. Used for small
+    files, where paying for a second conversion is cheaper than waiting
+    for a failure before falling back. Setting cancel_event kills all
+    engines.
+
+    Returns:
+        Tuple of (winning engine, PDF path)
+    """
+    cancel_event = cancel_event or threading.Event()
+    started_at = time.perf_counter()
+    winner = None
+    last_error = None
+
+    with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+        pending = {
+            executor.submit(run_word_engine, engine, docx_path, pages, cancel_event): engine
+            for engine in engines
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                engine = pending.pop(future)
+                elapsed = time.perf_counter() - started_at
+                try:
+                    engine_pdf_path = future.result()
+                except OperationCancelled:
+                    attempts.append((engine, elapsed, "cancelled"))
+                    continue
+                except Exception as e:
+                    attempts.append((engine, elapsed, "failed"))
+                    logger.warning(f"{engine} failed during hedged conversion: {e}")
+                    last_error = e
+                    continue
+
+                if winner is None:
+                    winner = (engine, engine_pdf_path)
+                    attempts.append((engine, elapsed, "ok"))
+                    cancel_event.set()
+                else:
+                    # Finished in the same instant as the winner
+                    attempts.append((engine, elapsed, "discarded"))
+                    cleanup_temp_files(engine_pdf_path)
+
+    if winner is None:
+        raise last_error or OperationCancelled("all engines cancelled")
+    return winner
+
 @app.post("/api/word-to-pdf")
 async def convert_word_to_pdf(
+    request: Request,
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     engine: str = Form("libreoffice")
@@ -235,12 +1657,17 @@ async def convert_word_to_pdf(
     """
     Convert Word document to PDF
 
+    With engine=auto the engines are ranked per document (see
+    choose_word_engines); a failed engine falls back to the next one, and
+    small files are sent to both engines at once (hedged).
+
     Args:
         file: DOCX file to convert
-        engine: Conversion engine ("libreoffice" or "pandoc")
+        engine: Conversion engine ("libreoffice", "pandoc" or "auto")
 
     Returns:
-        PDF file
+        PDF file; X-Conversion-Engine names the engine used and
+        X-Engine-Timings lists every attempt
     """
     # Validate file type
     if not file.filename.lower().endswith(('.docx', '.doc')):
@@ -259,61 +1686,44 @@ async def convert_word_to_pdf(
         docx_temp.write(content)
         docx_path = docx_temp.name
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
-        pdf_path = pdf_temp.name
-
-    try:
-        # Choose conversion engine
-        if engine.lower() == "pandoc" and PANDOC_AVAILABLE:
-            logger.info(f"Converting with Pandoc: {docx_path} -> {pdf_path}")
-
-            # Convert using Pandoc (better for tables)
-            result = subprocess.run([
-                'pandoc',
-                docx_path,
-                '-o', pdf_path,
-                '--pdf-engine=pdflatex',
-                '-V', 'geometry:margin=1in'
-            ], capture_output=True, text=True, timeout=60)
+    pdf_path = None
+    attempts = []
+    started_at = time.perf_counter()
 
-            if result.returncode != 0:
-                logger.warning(f"Pandoc conversion failed: {result.stderr}")
-                raise Exception(f"Pandoc conversion failed: {result.stderr}")
+    job_id = start_job("word_to_pdf")
 
-            logger.info(f"Pandoc conversion successful: {file.filename}")
+    try:
+        features = docx_features(docx_path)
+        annotate_profile(page_count=features["pages"])
+        hedged = False
 
+        # Choose conversion engine
+        if engine.lower() == "auto":
+            engines = choose_word_engines(features)
+            hedged = len(engines) > 1 and len(content) <= WORD_HEDGE_MAX_BYTES
+            logger.info(f"Engine order for {features}: {engines}{' (hedged)' if hedged else ''}")
+        elif engine.lower() == "pandoc" and PANDOC_AVAILABLE:
+            engines = ["pandoc"]
         else:
             # Use LibreOffice (default)
-            if not LIBREOFFICE_PATH:
-                raise HTTPException(
-                    status_code=503,
-                    detail="LibreOffice not installed on server. Please contact administrator."
-                )
+            engines = ["libreoffice"] if LIBREOFFICE_PATH else []
 
-            logger.info(f"Converting with LibreOffice: {docx_path} -> {pdf_path}")
-
-            # Use LibreOffice headless mode for conversion with better quality settings
-            result = subprocess.run([
-                LIBREOFFICE_PATH,
-                '--headless',
-                '--convert-to', 'pdf:writer_pdf_Export',
-                '--outdir', os.path.dirname(pdf_path),
-                docx_path
-            ], capture_output=True, text=True, timeout=60)
-
-            if result.returncode != 0:
-                raise Exception(f"LibreOffice conversion failed: {result.stderr}")
-
-            # LibreOffice creates file with original name, need to rename
-            libreoffice_output = os.path.join(
-                os.path.dirname(pdf_path),
-                os.path.basename(docx_path).rsplit('.', 1)[0] + '.pdf'
+        if not engines:
+            raise HTTPException(
+                status_code=503,
+                detail="LibreOffice not installed on server. Please contact administrator."
             )
 
-            if os.path.exists(libreoffice_output) and libreoffice_output != pdf_path:
-                os.rename(libreoffice_output, pdf_path)
+        with profile_stage("convert"):
+            convert = convert_word_hedged if hedged else convert_word_sequential
+            cancel_event = threading.Event()
+            used_engine, pdf_path = await cancel_on_disconnect(
+                request, job_id,
+                asyncio.to_thread(convert, engines, docx_path, features["pages"], attempts, cancel_event),
+                cancel_event
+            )
 
-            logger.info(f"LibreOffice conversion successful: {file.filename}")
+        logger.info(f"Conversion successful with {used_engine}: {file.filename}")
 
         # Generate output filename
         output_filename = file.filename.rsplit('.', 1)[0] + '.pdf'
@@ -321,25 +1731,164 @@ async def convert_word_to_pdf(
         # Schedule cleanup after response is sent
         background_tasks.add_task(cleanup_temp_files, docx_path, pdf_path)
 
+        finish_job(job_id, "done")
+
         return FileResponse(
             path=pdf_path,
             media_type="application/pdf",
-            filename=output_filename
+            filename=output_filename,
+            headers={
+                "X-Conversion-Engine": used_engine,
+                "X-Conversion-Time-Ms": str(int((time.perf_counter() - started_at) * 1000)),
+                "X-Engine-Timings": ";".join(
+                    f"{name}={int(seconds * 1000)}ms({outcome})" for name, seconds, outcome in attempts
+                )
+            }
         )
 
+    except HTTPException:
+        finish_job(job_id, "failed")
+        cleanup_temp_files(docx_path)
+        raise
+    except OperationCancelled:
+        finish_job(job_id, "cancelled")
+        logger.info(f"Conversion cancelled: {file.filename}")
+        cleanup_temp_files(docx_path)
+        raise HTTPException(status_code=499, detail="Client closed request")
     except subprocess.TimeoutExpired:
-        cleanup_temp_files(docx_path, pdf_path)
+        finish_job(job_id, "failed")
+        cleanup_temp_files(docx_path)
         raise HTTPException(status_code=500, detail="Conversion timeout (file too large or complex)")
     except Exception as e:
+        finish_job(job_id, "failed")
         logger.error(f"Conversion failed: {str(e)}")
-        cleanup_temp_files(docx_path, pdf_path)
+        cleanup_temp_files(docx_path)
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
 
+def ocr_pdf_file(pdf_path, output_pdf_path, language):
+    """
+    Create a searchable PDF with Tesseract (runs as a job)
+
+    Returns:
+        Number of pages processed
+    """
+    logger.info(f"Converting PDF to images for OCR: {pdf_path}")
+
+    # Convert PDF pages to images with lower DPI for smaller file size
+    with profile_stage("rasterize"):
+        images = convert_from_path(pdf_path, dpi=150)  # Reduced from 300 to 150 DPI
+    annotate_profile(page_count=len(images))
+
+    # Create searchable PDF pages using pytesseract
+    pdf_pages = []
+
+    for i, image in enumerate(images):
+        check_cancelled()
+        logger.info(f"OCR processing page {i + 1}/{len(images)}")
+
+        # Save image temporarily as JPEG for smaller size
+        img_path = tempfile.mktemp(suffix='.jpg')
+        image.save(img_path, 'JPEG', quality=85, optimize=True)
+
+        # Create searchable PDF for this page using pytesseract
+        # This creates a proper text layer with correctly positioned text
+        with profile_stage("ocr"):
+            pdf_bytes = pytesseract.image_to_pdf_or_hocr(img_path, lang=language, extension='pdf')
+
+        # Save the searchable PDF page
+        page_pdf_path = tempfile.mktemp(suffix='.pdf')
+        with open(page_pdf_path, 'wb') as f:
+            f.write(pdf_bytes)
+
+        pdf_pages.append(page_pdf_path)
+        os.unlink(img_path)
+
+    # Merge all pages into one PDF
+    if len(pdf_pages) == 1:
+        # Single page - just rename
+        os.rename(pdf_pages[0], output_pdf_path)
+    else:
+        # Multiple pages - merge them
+        pdf_document = fitz.open()
+        for page_path in pdf_pages:
+            page_doc = fitz.open(page_path)
+            pdf_document.insert_pdf(page_doc)
+            page_doc.close()
+            os.unlink(page_path)
+
+        # Save the merged PDF with compression
+        with profile_stage("merge"):
+            pdf_document.save(output_pdf_path, garbage=4, deflate=True)
+        pdf_document.close()
+
+    return len(images)
+
+def ocr_image_to_pdf(jpeg_bytes, language):
+    """
+    Run Tesseract on one page image through stdin/stdout
+
+    Returns:
+        Searchable single-page PDF bytes
+    """
+    process = subprocess.run(
+        [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "-l", language, "pdf"],
+        input=jpeg_bytes,
+        capture_output=True
+    )
+    if process.returncode != 0:
+        raise Exception(f"Tesseract failed: {process.stderr.decode(errors='replace').strip()}")
+    return process.stdout
+
+def render_page_jpeg(page):
+    """Rasterize a page for Tesseract, with the same resolution and JPEG settings as the disk path"""
+    pixmap = page.get_pixmap(dpi=150)
+    image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    jpeg_buffer = io.BytesIO()
+    image.save(jpeg_buffer, 'JPEG', quality=85, optimize=True)
+    return jpeg_buffer.getvalue()
+
+def ocr_pdf_bytes(content, language):
+    """
+    Create a searchable PDF from an in-memory PDF without touching the disk (runs as a job)
+
+    Pages are rasterized with PyMuPDF, since pdf2image and pytesseract both
+    go through temp files.
+
+    Returns:
+        Tuple of (searchable PDF bytes, number of pages)
+    """
+    with fitz.open(stream=content, filetype="pdf") as pdf_document, fitz.open() as output_document:
+        page_count = len(pdf_document)
+        annotate_profile(page_count=page_count)
+
+        for i, page in enumerate(pdf_document):
+            check_cancelled()
+            logger.info(f"OCR processing page {i + 1}/{page_count}")
+
+            with profile_stage("rasterize"):
+                jpeg_bytes = render_page_jpeg(page)
+
+            with profile_stage("ocr"):
+                page_pdf = ocr_image_to_pdf(jpeg_bytes, language)
+
+            with fitz.open(stream=page_pdf, filetype="pdf") as page_document:
+                output_document.insert_pdf(page_document)
+
+        with profile_stage("merge"):
+            return output_document.tobytes(garbage=4, deflate=True), page_count
+
 @app.post("/api/ocr")
-async def ocr_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...), language: str = Form("eng")):
+async def ocr_pdf(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    language: str = Form("eng")
+):
     """
     Perform OCR on scanned PDF and create searchable PDF
 
+    Files up to INMEMORY_MAX_BYTES are processed without temp files.
+
     Args:
         file: PDF file to OCR
         language: OCR language code (eng, spa, fra, deu, etc.)
@@ -354,93 +1903,580 @@ async def ocr_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
     logger.info(f"OCR processing: {file.filename} (language: {language})")
 
-    # Create temporary files
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
-        content = await file.read()
-
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
-
-        pdf_temp.write(content)
-        pdf_path = pdf_temp.name
-
-    output_pdf_path = tempfile.mktemp(suffix='_ocr.pdf')
+    content = await file.read()
 
-    try:
-        logger.info(f"Converting PDF to images for OCR: {pdf_path}")
-
-        # Convert PDF pages to images with lower DPI for smaller file size
-        images = convert_from_path(pdf_path, dpi=150)  # Reduced from 300 to 150 DPI
-
-        # Create searchable PDF pages using pytesseract
-        pdf_pages = []
+    if len(content) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
 
-        for i, image in enumerate(images):
-            logger.info(f"OCR processing page {i + 1}/{len(images)}")
+    in_memory = len(content) <= INMEMORY_MAX_BYTES
+    pdf_path = output_pdf_path = None
+    if not in_memory:
+        # Create temporary files
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
+            pdf_temp.write(content)
+            pdf_path = pdf_temp.name
 
-            # Save image temporarily as JPEG for smaller size
-            img_path = tempfile.mktemp(suffix='.jpg')
-            image.save(img_path, 'JPEG', quality=85, optimize=True)
+        output_pdf_path = tempfile.mktemp(suffix='_ocr.pdf')
 
-            # Create searchable PDF for this page using pytesseract
-            # This creates a proper text layer with correctly positioned text
-            pdf_bytes = pytesseract.image_to_pdf_or_hocr(img_path, lang=language, extension='pdf')
-
-            # Save the searchable PDF page
-            page_pdf_path = tempfile.mktemp(suffix='.pdf')
-            with open(page_pdf_path, 'wb') as f:
-                f.write(pdf_bytes)
+    job_id = start_job("ocr")
 
-            pdf_pages.append(page_pdf_path)
-            os.unlink(img_path)
-
-        # Merge all pages into one PDF
-        if len(pdf_pages) == 1:
-            # Single page - just rename
-            os.rename(pdf_pages[0], output_pdf_path)
+    try:
+        started_at = time.perf_counter()
+        if in_memory:
+            ocr_content, page_count = await cancel_on_disconnect(
+                request, job_id, run_job(ocr_pdf_bytes, content, language, job_id=job_id)
+            )
         else:
-            # Multiple pages - merge them
-            pdf_document = fitz.open()
-            for page_path in pdf_pages:
-                page_doc = fitz.open(page_path)
-                pdf_document.insert_pdf(page_doc)
-                page_doc.close()
-                os.unlink(page_path)
-
-            # Save the merged PDF with compression
-            pdf_document.save(output_pdf_path, garbage=4, deflate=True)
-            pdf_document.close()
+            page_count = await cancel_on_disconnect(
+                request, job_id, run_job(ocr_pdf_file, pdf_path, output_pdf_path, language, job_id=job_id)
+            )
 
+        record_operation_timing("ocr", page_count, len(content), time.perf_counter() - started_at)
         logger.info(f"OCR successful: {file.filename}")
 
         # Generate output filename
         output_filename = file.filename.rsplit('.', 1)[0] + '_ocr.pdf'
 
+        if in_memory:
+            finish_job(job_id, "done")
+            return attachment_response(ocr_content, "application/pdf", output_filename)
+
         # Schedule cleanup after response is sent
         background_tasks.add_task(cleanup_temp_files, pdf_path, output_pdf_path)
 
+        finish_job(job_id, "done")
+
         return FileResponse(
             path=output_pdf_path,
             media_type="application/pdf",
             filename=output_filename
         )
 
+    except OperationCancelled:
+        finish_job(job_id, "cancelled")
+        logger.info(f"OCR cancelled: {file.filename}")
+        cleanup_temp_files(pdf_path, output_pdf_path)
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+    except (JobLimitExceeded, WorkerCrashed) as e:
+        finish_job(job_id, "failed")
+        logger.error(f"OCR stopped: {file.filename} ({e!r})")
+        cleanup_temp_files(pdf_path, output_pdf_path)
+        raise job_error_response(e)
+
     except Exception as e:
+        finish_job(job_id, "failed")
         logger.error(f"OCR failed: {str(e)}")
         cleanup_temp_files(pdf_path, output_pdf_path)
         raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
 
+# Compression settings based on quality
+# resize_factor: percentage of original dimensions to keep
+COMPRESSION_QUALITY_SETTINGS = {
+    "low": {"garbage": 4, "image_quality": 50, "resize_factor": 0.5},      # 50% size, 50% quality
+    "medium": {"garbage": 3, "image_quality": 75, "resize_factor": 0.7},   # 70% size, 75% quality
+    "high": {"garbage": 2, "image_quality": 90, "resize_factor": 0.85}     # 85% size, 90% quality
+}
+
+# Sharded compression for large inputs: the images are split into groups that
+# are recompressed in parallel processes, then written into the document by one process
+COMPRESS_SHARD_MIN_PAGES = int(os.getenv("COMPRESS_SHARD_MIN_PAGES", "40"))
+COMPRESS_SHARD_MIN_BYTES = int(os.getenv("COMPRESS_SHARD_MIN_MB", "20")) * 1024 * 1024
+COMPRESS_SHARD_IMAGE_BYTES = int(os.getenv("COMPRESS_SHARD_IMAGE_MB", "4")) * 1024 * 1024  # Stored image data per shard
+def get_web_concurrency():
+    """
+    Number of web worker processes on this host
+
+    Gunicorn exports WEB_CONCURRENCY (gunicorn.conf.py); `uvicorn --workers N`
+    does not, but its worker processes are started with the same command line.
+    """
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    if "uvicorn" in os.path.basename(sys.argv[0]) or sys.argv[0].endswith("uvicorn/__main__.py"):
+        for index, arg in enumerate(sys.argv):
+            if arg.startswith("--workers="):
+                return int(arg.split("=", 1)[1])
+            if arg == "--workers" and index + 1 < len(sys.argv):
+                return int(sys.argv[index + 1])
+    return 1
+
+# Each web worker gets its share of the CPUs so N workers do not oversubscribe the host
+WEB_CONCURRENCY = get_web_concurrency()
+COMPRESS_MAX_PROCESSES = int(os.getenv("COMPRESS_MAX_PROCESSES", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+
+def document_image_xrefs(pdf_document):
+    """Image xrefs of a document in page order, each once even when several pages share it"""
+    xrefs = []
+    seen = set()
+    for page in pdf_document:
+        for img in page.get_images(full=True):
+            if img[0] not in seen:
+                seen.add(img[0])
+                xrefs.append(img[0])
+    return xrefs
+
+def recompress_image(pdf_document, xref, settings):
+    """
+    Recompress one image as a JPEG with the quality settings
+
+    The document is not changed, see replace_image_streams.
+
+    Returns:
+        Dict with stream, width, height and grayscale, or None if the image
+        is skipped
+    """
+    stored_size = stream_length(pdf_document, xref)
+
+    # Extract image
+    base_image = pdf_document.extract_image(xref)
+    image_bytes = base_image["image"]
+    image_ext = base_image["ext"]
+    original_image_size = len(image_bytes)
+
+    # Skip if not a compressible format
+    if image_ext not in ["png", "jpg", "jpeg", "bmp", "tiff"]:
+        return None
+
+    # Skip very small images (< 10KB) - not worth compressing
+    if original_image_size < 10240:
+        return None
+
+    # Open with PIL
+    img_pil = Image.open(io.BytesIO(image_bytes))
+    original_width, original_height = img_pil.size
+
+    # Skip very small dimensions (< 100px on either side)
+    if original_width < 100 or original_height < 100:
+        return None
+
+    # Convert RGBA to RGB if necessary
+    if img_pil.mode == 'RGBA':
+        rgb_img = Image.new('RGB', img_pil.size, (255, 255, 255))
+        rgb_img.paste(img_pil, mask=img_pil.split()[3])
+        img_pil = rgb_img
+    elif img_pil.mode not in ['RGB', 'L']:
+        img_pil = img_pil.convert('RGB')
+
+    # Resize image based on quality setting
+    new_width = int(original_width * settings["resize_factor"])
+    new_height = int(original_height * settings["resize_factor"])
+
+    # Only resize if the new size is smaller
+    if new_width < original_width and new_height < original_height:
+        img_pil = img_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    # Recompress image with quality setting
+    img_output = io.BytesIO()
+    img_pil.save(img_output, format='JPEG', quality=settings["image_quality"], optimize=True)
+    img_data = img_output.getvalue()
+    compressed_image_size = len(img_data)
+
+    # Only replace if compressed version is actually smaller than the stored stream
+    if compressed_image_size >= stored_size:
+        logger.info(f"Skipped image {xref}: compressed version would be larger")
+        return None
+
+    savings = stored_size - compressed_image_size
+    logger.info(f"Compressed image {xref}: {original_width}x{original_height} -> {img_pil.width}x{img_pil.height}, saved {savings} bytes")
+    return {
+        "stream": img_data,
+        "width": img_pil.width,
+        "height": img_pil.height,
+        "grayscale": img_pil.mode == 'L'
+    }
+
+def recompress_images(pdf_document, xrefs, settings):
+    """
+    Recompress a set of images of a PDF without changing the document
+
+    Returns:
+        Dict of xref -> recompressed image (see recompress_image) for the
+        images worth replacing
+    """
+    images = {}
+    for xref in xrefs:
+        check_cancelled()
+        try:
+            image = recompress_image(pdf_document, xref, settings)
+        except Exception as e:
+            # Skip problematic images
+            logger.warning(f"Could not compress image {xref}: {e}")
+            continue
+        if image is not None:
+            images[xref] = image
+    return images
+
+def replace_image_streams(pdf_document, images):
+    """
+    Write recompressed images over their original image objects
+
+    Only the image stream and its dictionary change, so every page, form
+    XObject and annotation referring to the image keeps working. A soft mask
+    is kept; it may have a different size than the image.
+
+    Returns:
+        Bytes saved, as the change in stored stream size
+    """
+    bytes_saved = 0
+    for xref, image in images.items():
+        bytes_saved += stream_length(pdf_document, xref) - len(image["stream"])
+        value_type, smask = pdf_document.xref_get_key(xref, "SMask")
+        color_space = "/DeviceGray" if image["grayscale"] else "/DeviceRGB"
+        pdf_document.update_stream(xref, image["stream"], compress=0)
+        pdf_document.update_object(
+            xref,
+            f"<</Type/XObject/Subtype/Image/Width {image['width']}/Height {image['height']}"
+            f"/ColorSpace{color_space}/BitsPerComponent 8/Filter/DCTDecode"
+            f"{f'/SMask {smask}' if value_type == 'xref' else ''}>>"
+        )
+    return bytes_saved
+
+def inspect_pdf_images(source):
+    """
+    Page count and stored image sizes of a PDF (runs as a job)
+
+    Uploads are only parsed inside jobs, so a malformed file that makes
+    MuPDF repair or scan it stays under the per-job limits.
+
+    Returns:
+        Tuple of (page count, dict of image xref -> stored stream size)
+    """
+    with open_pdf_source(source) as pdf_document:
+        return len(pdf_document), {
+            xref: stream_length(pdf_document, xref) for xref in document_image_xrefs(pdf_document)
+        }
+
+def compress_document_images(pdf_document, settings, images=None):
+    """
+    Recompress the images of an open PDF document in place
+
+    Each image xref is processed once, even when several pages share it.
+
+    Args:
+        pdf_document: Open PDF document
+        settings: Compression quality settings
+        images: Images already recompressed by shard jobs (see
+            compress_pdf_sharded) to write instead of recompressing here
+
+    Returns:
+        Dict with images_compressed, images_skipped and image_bytes_saved
+    """
+    xrefs = document_image_xrefs(pdf_document)
+    if images is None:
+        images = recompress_images(pdf_document, xrefs, settings)
+    image_bytes_saved = replace_image_streams(pdf_document, images)
+
+    return {
+        "images_compressed": len(images),
+        "images_skipped": len(xrefs) - len(images),
+        "image_bytes_saved": image_bytes_saved
+    }
+
+FONT_FILE_KEYS = ("FontFile", "FontFile2", "FontFile3")
+OBJECT_REFERENCE = re.compile(r'\b(\d+) 0 R\b')
+
+def embedded_font_xrefs(pdf_document):
+    """Xrefs of the embedded font programs in a document"""
+    font_xrefs = set()
+    for xref in range(1, pdf_document.xref_length()):
+        if pdf_document.xref_get_key(xref, "Type") != ("name", "/FontDescriptor"):
+            continue
+        for key in FONT_FILE_KEYS:
+            value_type, value = pdf_document.xref_get_key(xref, key)
+            if value_type == "xref":
+                font_xrefs.add(int(value.split()[0]))
+    return font_xrefs
+
+def embedded_font_bytes(pdf_document):
+    """Total stored size of the embedded font programs in a document"""
+    return sum(stream_length(pdf_document, xref) for xref in embedded_font_xrefs(pdf_document))
+
+def subset_document_fonts(pdf_document):
+    """
+    Replace embedded fonts with subsets containing only the glyphs in use
+
+    Returns:
+        Bytes of font programs saved
+    """
+    font_bytes_before = embedded_font_bytes(pdf_document)
+    if font_bytes_before == 0:
+        return 0
+
+    try:
+        pdf_document.subset_fonts()
+    except Exception as e:
+        logger.warning(f"Font subsetting failed, keeping full fonts: {e}")
+        return 0
+
+    # Subset fonts are written unfiltered; deflate them now (as the save
+    # would) so the saving compares stored sizes of the same kind
+    for xref in embedded_font_xrefs(pdf_document):
+        if pdf_document.xref_get_key(xref, "Filter")[0] == "null":
+            pdf_document.update_stream(xref, pdf_document.xref_stream(xref))
+
+    return font_bytes_before - embedded_font_bytes(pdf_document)
+
+def deduplicate_streams(pdf_document):
+    """
+    Merge streams with identical content (form XObjects, ICC profiles, images, fonts)
+
+    Streams are keyed by a hash of their raw data plus their dictionary
+    entries (order-independent, ignoring /Length), and
+    every reference to a duplicate is rewritten to the first copy. The
+    duplicates are then unreferenced and dropped by garbage collection on
+    save. Repeated until stable, because merging e.g. two soft masks can make
+    the images that use them identical too.
+
+    Returns:
+        Tuple of (duplicate streams removed, bytes of stream data saved)
+    """
+    removed_xrefs = set()
+    bytes_saved = 0
+
+    while True:
+        canonical_by_key = {}
+        replacements = {}
+
+        for xref in range(1, pdf_document.xref_length()):
+            if xref in removed_xrefs or not pdf_document.xref_is_stream(xref):
+                continue
+            raw_stream = pdf_document.xref_stream_raw(xref) or b""
+            stream_dictionary = tuple(sorted(
+                (key, pdf_document.xref_get_key(xref, key))
+                for key in pdf_document.xref_get_keys(xref)
+                if key != "Length"
+            ))
+            key = (hashlib.sha256(raw_stream).digest(), stream_dictionary)
+            if key in canonical_by_key:
+                replacements[xref] = canonical_by_key[key]
+                bytes_saved += len(raw_stream)
+            else:
+                canonical_by_key[key] = xref
+
+        if not replacements:
+            break
+        removed_xrefs.update(replacements)
+
+        def replace_reference(match):
+            xref = int(match.group(1))
+            return f"{replacements.get(xref, xref)} 0 R"
+
+        for xref in range(1, pdf_document.xref_length()):
+            if xref in removed_xrefs:
+                continue
+            if pdf_document.xref_is_stream(xref):
+                # Rewrite key by key so the stream data stays attached
+                for key in pdf_document.xref_get_keys(xref):
+                    value_type, value = pdf_document.xref_get_key(xref, key)
+                    if value_type in ("xref", "array", "dict"):
+                        new_value = OBJECT_REFERENCE.sub(replace_reference, value)
+                        if new_value != value:
+                            pdf_document.xref_set_key(xref, key, new_value)
+            else:
+                source = pdf_document.xref_object(xref, compressed=True)
+                new_source = OBJECT_REFERENCE.sub(replace_reference, source)
+                if new_source != source:
+                    pdf_document.update_object(xref, new_source)
+
+    return len(removed_xrefs), bytes_saved
+
+def optimize_document_structure(pdf_document):
+    """
+    Structural compression stage: font subsetting and stream deduplication
+
+    Object/xref streams and linearization are applied at save time, see
+    get_save_options.
+
+    Returns:
+        Dict with font_bytes_saved, duplicate_streams and duplicate_bytes_saved
+    """
+    font_bytes_saved = subset_document_fonts(pdf_document)
+    duplicate_streams, duplicate_bytes_saved = deduplicate_streams(pdf_document)
+
+    logger.info(f"Structural optimization: fonts saved {font_bytes_saved} bytes, "
+                f"{duplicate_streams} duplicate streams ({duplicate_bytes_saved} bytes)")
+
+    return {
+        "font_bytes_saved": font_bytes_saved,
+        "duplicate_streams": duplicate_streams,
+        "duplicate_bytes_saved": duplicate_bytes_saved
+    }
+
+def get_save_options(settings, structural=False, linearize=False, garbage=None):
+    """
+    Keyword arguments for fitz.Document.save
+
+    structural packs objects into object streams with a cross-reference
+    stream. linearize writes a "fast web view" file instead; MuPDF cannot
+    combine linearization with object streams, so it takes precedence.
+    """
+    options = {
+        "garbage": settings["garbage"] if garbage is None else garbage,
+        "deflate": True,
+        "deflate_images": True,
+        "deflate_fonts": True
+    }
+    if linearize:
+        options["linear"] = True
+    elif structural:
+        options["use_objstms"] = True
+    return options
+
+def compress_pdf_document(pdf_document, settings, structural=False, images=None):
+    """
+    Run the image and structural stages on an open PDF document
+
+    Returns:
+        Image statistics from compress_document_images, plus the structural
+        statistics from optimize_document_structure when structural is set
+    """
+    with profile_stage("images"):
+        stats = compress_document_images(pdf_document, settings, images)
+    if structural:
+        with profile_stage("structure"):
+            stats.update(optimize_document_structure(pdf_document))
+    return stats
+
+def compress_pdf_file(pdf_path, output_path, settings, structural=False, linearize=False, images=None):
+    """
+    Compress a PDF in the current process
+
+    images are the recompressed images of a sharded compression, see
+    compress_pdf_sharded.
+
+    Returns:
+        Statistics from compress_pdf_document
+    """
+    pdf_document = fitz.open(pdf_path)
+    try:
+        stats = compress_pdf_document(pdf_document, settings, structural, images)
+        with profile_stage("save"):
+            pdf_document.save(output_path, **get_save_options(settings, structural, linearize))
+    finally:
+        pdf_document.close()
+    return stats
+
+def compress_pdf_bytes(content, settings, structural=False, linearize=False):
+    """
+    Compress an in-memory PDF without touching the disk
+
+    Returns:
+        Tuple of (compressed PDF bytes, statistics from compress_pdf_document)
+    """
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        stats = compress_pdf_document(pdf_document, settings, structural)
+        with profile_stage("save"):
+            compressed = pdf_document.tobytes(**get_save_options(settings, structural, linearize))
+    return compressed, stats
+
+def compress_image_shard(pdf_path, xrefs, settings):
+    """
+    Recompress some of the images of a PDF (runs as a job)
+
+    Returns:
+        Dict of xref -> recompressed image, see recompress_images
+    """
+    with fitz.open(pdf_path) as pdf_document:
+        return recompress_images(pdf_document, xrefs, settings)
+
+def split_image_xrefs(image_sizes, shard_count):
+    """
+    Split image xrefs into up to shard_count groups of similar total size
+
+    Args:
+        image_sizes: Dict of xref -> stored stream size
+
+    Returns:
+        Non-empty lists of xrefs
+    """
+    groups = [[] for _ in range(shard_count)]
+    group_sizes = [0] * shard_count
+    # Largest first, each into the currently smallest group
+    for xref in sorted(image_sizes, key=image_sizes.get, reverse=True):
+        smallest = group_sizes.index(min(group_sizes))
+        groups[smallest].append(xref)
+        group_sizes[smallest] += image_sizes[xref]
+    return [group for group in groups if group]
+
+def get_shard_count(page_count, file_size, image_count, image_bytes):
+    """
+    Number of shards to use for a document, or 1 for the single-process path
+
+    Shards split the images, so their number follows the stored image data
+    (one shard per COMPRESS_SHARD_IMAGE_BYTES), not the page count: a short
+    scan with large images is the case sharding is for.
+    """
+    if page_count < COMPRESS_SHARD_MIN_PAGES and file_size < COMPRESS_SHARD_MIN_BYTES:
+        return 1
+    shards_for_bytes = -(-image_bytes // COMPRESS_SHARD_IMAGE_BYTES)
+    return max(1, min(COMPRESS_MAX_PROCESSES, image_count, shards_for_bytes))
+
+def compress_pdf_sharded(pdf_path, output_path, settings, shard_count, structural=False, linearize=False, job_id=None,
+                         image_sizes=None):
+    """
+    Compress a PDF with its images recompressed in parallel worker processes
+
+    The image xrefs are split into shard_count groups, and each shard job
+    recompresses one group and returns the new image streams by xref. One
+    final job writes them into the original document, runs the structural
+    stage and saves, so the page tree, form fields, links, page labels and
+    outline are never split and the output matches the single-process path.
+
+    With job_id, the jobs stop early once the job is cancelled. image_sizes
+    is the result of inspect_pdf_images, if the caller already has it.
+
+    Returns:
+        Statistics from compress_pdf_document
+    """
+    if image_sizes is None:
+        pool, future = submit_job(inspect_pdf_images, pdf_path, job_id=job_id)
+        _, image_sizes = wait_for_job(pool, future, "inspect")
+
+    images = {}
+    with profile_stage("shards"):
+        jobs = [
+            submit_job(compress_image_shard, pdf_path, xrefs, settings, job_id=job_id)
+            for xrefs in split_image_xrefs(image_sizes, shard_count)
+        ]
+        try:
+            # Shards run in parallel, so only their samples are merged, not their stage timings
+            for shard_index, (pool, future) in enumerate(jobs):
+                images.update(wait_for_job(pool, future, f"shard {shard_index}", merge_stages=False))
+        except BaseException:
+            for _, future in jobs:
+                future.cancel()
+            raise
+
+    # Writing the images back holds the whole document in memory, so it is a job of its own
+    pool, future = submit_job(
+        compress_pdf_file, pdf_path, output_path, settings, structural, linearize, images, job_id=job_id
+    )
+    return wait_for_job(pool, future, "apply")
+
 @app.post("/api/compress")
-async def compress_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...), quality: str = Form("medium")):
+async def compress_pdf(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    quality: str = Form("medium"),
+    structural: bool = Form(True),
+    linearize: bool = Form(False)
+):
     """
     Compress PDF file to reduce size
 
+    Large documents (see COMPRESS_SHARD_MIN_PAGES / COMPRESS_SHARD_MIN_MB) have
+    their images recompressed in shards across worker processes; files up to
+    INMEMORY_MAX_BYTES that need no sharding are compressed without temp files.
+
     Args:
         file: PDF file to compress
         quality: Compression quality (low, medium, high)
+        structural: Subset fonts, merge duplicate streams and write object streams
+        linearize: Write a linearized ("fast web view") file
 
     Returns:
-        Compressed PDF file
+        Compressed PDF file, with bytes saved per stage in X-Compression-Stages
     """
     # Validate file type
     if not file.filename.lower().endswith('.pdf'):
@@ -449,131 +2485,95 @@ async def compress_pdf(background_tasks: BackgroundTasks, file: UploadFile = Fil
     MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB for compression
     logger.info(f"Compressing PDF: {file.filename} (quality: {quality})")
 
-    # Create temporary files
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
-        content = await file.read()
+    content = await file.read()
 
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File size exceeds 100MB limit")
+    if len(content) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds 100MB limit")
 
-        pdf_temp.write(content)
-        pdf_path = pdf_temp.name
+    pdf_path = compressed_pdf_path = None
 
-    compressed_pdf_path = tempfile.mktemp(suffix='_compressed.pdf')
+    job_id = start_job("compress")
 
     try:
-        # Open PDF with PyMuPDF
-        pdf_document = fitz.open(pdf_path)
-
-        # Compression settings based on quality
-        # resize_factor: percentage of original dimensions to keep
-        quality_settings = {
-            "low": {"garbage": 4, "image_quality": 50, "resize_factor": 0.5},      # 50% size, 50% quality
-            "medium": {"garbage": 3, "image_quality": 75, "resize_factor": 0.7},   # 70% size, 75% quality
-            "high": {"garbage": 2, "image_quality": 90, "resize_factor": 0.85}     # 85% size, 90% quality
-        }
-
-        settings = quality_settings.get(quality, quality_settings["medium"])
-        image_quality = settings["image_quality"]
-        resize_factor = settings["resize_factor"]
-
-        logger.info(f"Applying compression with settings: {settings}")
-
-        # Compress images in each page
-        images_compressed = 0
-        images_skipped = 0
-
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            image_list = page.get_images(full=True)
-
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                try:
-                    # Extract image
-                    base_image = pdf_document.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image_ext = base_image["ext"]
-                    original_image_size = len(image_bytes)
-
-                    # Skip if not a compressible format
-                    if image_ext not in ["png", "jpg", "jpeg", "bmp", "tiff"]:
-                        images_skipped += 1
-                        continue
-
-                    # Skip very small images (< 10KB) - not worth compressing
-                    if original_image_size < 10240:
-                        images_skipped += 1
-                        continue
-
-                    # Open with PIL
-                    img_pil = Image.open(io.BytesIO(image_bytes))
-                    original_width, original_height = img_pil.size
-
-                    # Skip very small dimensions (< 100px on either side)
-                    if original_width < 100 or original_height < 100:
-                        images_skipped += 1
-                        continue
-
-                    # Convert RGBA to RGB if necessary
-                    if img_pil.mode == 'RGBA':
-                        rgb_img = Image.new('RGB', img_pil.size, (255, 255, 255))
-                        rgb_img.paste(img_pil, mask=img_pil.split()[3])
-                        img_pil = rgb_img
-                    elif img_pil.mode not in ['RGB', 'L']:
-                        img_pil = img_pil.convert('RGB')
-
-                    # Resize image based on quality setting
-                    new_width = int(original_width * resize_factor)
-                    new_height = int(original_height * resize_factor)
-
-                    # Only resize if the new size is smaller
-                    if new_width < original_width and new_height < original_height:
-                        img_pil = img_pil.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                    # Recompress image with quality setting
-                    img_output = io.BytesIO()
-                    img_pil.save(img_output, format='JPEG', quality=image_quality, optimize=True)
-                    img_data = img_output.getvalue()
-                    compressed_image_size = len(img_data)
-
-                    # Only replace if compressed version is actually smaller
-                    if compressed_image_size < original_image_size:
-                        page.replace_image(xref, stream=img_data)
-                        images_compressed += 1
-                        savings = original_image_size - compressed_image_size
-                        logger.info(f"Compressed image {img_index} on page {page_num}: {original_width}x{original_height} -> {new_width}x{new_height}, saved {savings} bytes")
-                    else:
-                        images_skipped += 1
-                        logger.info(f"Skipped image {img_index} on page {page_num}: compressed version would be larger")
-
-                except Exception as e:
-                    # Skip problematic images
-                    logger.warning(f"Could not compress image {img_index} on page {page_num}: {e}")
-                    images_skipped += 1
-                    continue
+        settings = COMPRESSION_QUALITY_SETTINGS.get(quality, COMPRESSION_QUALITY_SETTINGS["medium"])
+        started_at = time.perf_counter()
+
+        # Reuse the /api/analyze profile when the client ran a pre-flight
+        profile = await asyncio.to_thread(find_cached_profile, content)
+        image_sizes = None
+        if profile:
+            page_count = profile["page_count"]
+            image_count, image_bytes = profile["images"]["count"], profile["images"]["bytes"]
+        else:
+            page_count, image_sizes = await cancel_on_disconnect(
+                request, job_id, run_job(inspect_pdf_images, content, job_id=job_id)
+            )
+            image_count, image_bytes = len(image_sizes), sum(image_sizes.values())
+        shard_count = get_shard_count(page_count, len(content), image_count, image_bytes)
+        annotate_profile(page_count=page_count)
+
+        in_memory = shard_count == 1 and len(content) <= INMEMORY_MAX_BYTES
+        if not in_memory:
+            # Create temporary files
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
+                pdf_temp.write(content)
+                pdf_path = pdf_temp.name
+
+            compressed_pdf_path = tempfile.mktemp(suffix='_compressed.pdf')
+
+        logger.info(
+            f"Applying compression with settings: {settings} "
+            f"({shard_count} shard(s), {page_count} pages{', in memory' if in_memory else ''})"
+        )
 
-        logger.info(f"Compression complete: {images_compressed} images compressed, {images_skipped} images skipped")
+        if in_memory:
+            work = run_job(compress_pdf_bytes, content, settings, structural, linearize, job_id=job_id)
+        elif shard_count > 1:
+            work = asyncio.to_thread(
+                compress_pdf_sharded, pdf_path, compressed_pdf_path, settings, shard_count, structural, linearize, job_id,
+                image_sizes
+            )
+        else:
+            work = run_job(compress_pdf_file, pdf_path, compressed_pdf_path, settings, structural, linearize, job_id=job_id)
+        result = await cancel_on_disconnect(request, job_id, work)
+        compressed_content, stats = result if in_memory else (None, result)
 
-        # Save with compression
-        pdf_document.save(
-            compressed_pdf_path,
-            garbage=settings["garbage"],
-            deflate=True,
-            deflate_images=True,
-            deflate_fonts=True
-        )
-        pdf_document.close()
+        logger.info(f"Compression complete: {stats['images_compressed']} images compressed, {stats['images_skipped']} images skipped")
+        record_operation_timing("compress", page_count, len(content), time.perf_counter() - started_at)
 
         # Get file sizes
-        original_size = os.path.getsize(pdf_path)
-        compressed_size = os.path.getsize(compressed_pdf_path)
+        original_size = len(content)
+        compressed_size = len(compressed_content) if in_memory else os.path.getsize(compressed_pdf_path)
         reduction = ((original_size - compressed_size) / original_size) * 100
 
+        # Bytes saved per stage, each measured as the change in stored stream
+        # sizes it made; "container" is whatever the save itself gained or
+        # lost (garbage collection, deflate, object/xref streams)
+        stage_savings = {
+            "images": stats["image_bytes_saved"],
+            "fonts": stats.get("font_bytes_saved", 0),
+            "duplicates": stats.get("duplicate_bytes_saved", 0)
+        }
+        stage_savings["container"] = original_size - compressed_size - sum(stage_savings.values())
+        logger.info(f"Compression stages: {stage_savings}")
+
         logger.info(f"Compression successful: {file.filename} - Reduced by {reduction:.1f}%")
 
         # Generate output filename
         output_filename = file.filename.rsplit('.', 1)[0] + '_compressed.pdf'
+        headers = {
+            "X-Original-Size": str(original_size),
+            "X-Compressed-Size": str(compressed_size),
+            "X-Reduction-Percent": f"{reduction:.1f}",
+            "X-Compression-Shards": str(shard_count),
+            "X-Compression-Stages": ";".join(f"{stage}={saved}" for stage, saved in stage_savings.items()),
+            "X-Profile-Cache": "hit" if profile else "miss"
+        }
+
+        finish_job(job_id, "done")
+
+        if in_memory:
+            return attachment_response(compressed_content, "application/pdf", output_filename, headers)
 
         # Schedule cleanup after response is sent
         background_tasks.add_task(cleanup_temp_files, pdf_path, compressed_pdf_path)
@@ -582,23 +2582,366 @@ async def compress_pdf(background_tasks: BackgroundTasks, file: UploadFile = Fil
             path=compressed_pdf_path,
             media_type="application/pdf",
             filename=output_filename,
-            headers={
-                "X-Original-Size": str(original_size),
-                "X-Compressed-Size": str(compressed_size),
-                "X-Reduction-Percent": f"{reduction:.1f}"
-            }
+            headers=headers
         )
 
+    except OperationCancelled:
+        finish_job(job_id, "cancelled")
+        logger.info(f"Compression cancelled: {file.filename}")
+        cleanup_temp_files(pdf_path, compressed_pdf_path)
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+    except (JobLimitExceeded, WorkerCrashed) as e:
+        finish_job(job_id, "failed")
+        logger.error(f"Compression stopped: {file.filename} ({e!r})")
+        cleanup_temp_files(pdf_path, compressed_pdf_path)
+        raise job_error_response(e)
+
     except Exception as e:
+        finish_job(job_id, "failed")
         logger.error(f"Compression failed: {str(e)}")
         cleanup_temp_files(pdf_path, compressed_pdf_path)
         raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
 
+def profile_pdf_content(content):
+    """Build the document profile of an in-memory PDF (runs as a job)"""
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        if pdf_document.needs_pass:
+            raise PermissionError("PDF is password-protected")
+        with profile_stage("profile"):
+            return build_document_profile(pdf_document, len(content))
+
+@app.post("/api/analyze")
+async def analyze_pdf(file: UploadFile = File(...), quality: str = Form("medium")):
+    """
+    Pre-flight analysis of a PDF without processing it
+
+    Reads only the document structure (no image decoding or rendering) and
+    estimates compression savings and processing times. Profiles are cached
+    by content hash, so analyzing the same file again, or submitting it to
+    /api/compress afterwards, skips re-parsing.
+
+    Args:
+        file: PDF file to analyze
+        quality: Compression quality used for the savings estimate
+
+    Returns:
+        Document profile with estimates
+    """
+    # Validate file type
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+
+    MAX_FILE_SIZE = 100 * 1024 * 1024  # Largest limit of the processing endpoints
+    content = await file.read()
+
+    if len(content) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds 100MB limit")
+
+    digest = await asyncio.to_thread(content_hash, content)
+    profile = await asyncio.to_thread(get_cached_profile, digest)
+    cached = profile is not None
+
+    if not cached:
+        try:
+            profile = await run_job(profile_pdf_content, content)
+        except PermissionError:
+            raise HTTPException(status_code=400, detail="Password-protected PDFs cannot be analyzed")
+        except (JobLimitExceeded, WorkerCrashed) as e:
+            logger.error(f"Analysis stopped: {file.filename} ({e!r})")
+            raise job_error_response(e)
+        except Exception as e:
+            logger.error(f"Analysis failed: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Could not read PDF: {str(e)}")
+        cache_profile(digest, profile)
+
+    page_count = profile["page_count"]
+    compress_savings = estimate_compress_savings(profile, quality)
+
+    return {
+        "sha256": digest,
+        "cached": cached,
+        **profile,
+        "estimates": {
+            "compress": {
+                "quality": quality,
+                "savings_bytes": compress_savings,
+                "savings_percent": round(compress_savings / len(content) * 100, 1) if content else 0.0,
+                "seconds": round(estimate_operation_seconds("compress", page_count, len(content)), 2)
+            },
+            "ocr": {
+                "seconds": round(estimate_operation_seconds("ocr", page_count, len(content)), 2)
+            },
+            "convert": {
+                "seconds": round(estimate_operation_seconds("convert", page_count, len(content)), 2)
+            }
+        }
+    }
+
+# Text extraction streams one NDJSON record per page. Text layers are read in
+# batches of pages, one job per batch over a single open document; only the
+# pages without a text layer get a job of their own for OCR. A few jobs run
+# in parallel while records are sent in page order.
+EXTRACT_TEXT_BATCH_PAGES = int(os.getenv("EXTRACT_TEXT_BATCH_PAGES", "20"))
+EXTRACT_TEXT_BATCHES_IN_FLIGHT = max(2, COMPRESS_MAX_PROCESSES)
+
+def parse_page_ranges(spec, page_count):
+    """
+    Parse a page selection like "1-3,5,8-" (1-based, open-ended ranges allowed)
+
+    Returns:
+        Sorted 0-based page indexes; all pages for an empty spec
+
+    Raises:
+        ValueError: for malformed ranges or pages outside the document
+    """
+    if not spec or not spec.strip():
+        return list(range(page_count))
+
+    indexes = set()
+    for part in spec.split(","):
+        match = re.fullmatch(r"\s*(\d+)?\s*(-)?\s*(\d+)?\s*", part)
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"Invalid page range '{part.strip()}'")
+        first = int(match.group(1)) if match.group(1) else 1
+        last = (int(match.group(3)) if match.group(3) else page_count) if match.group(2) else first
+        if not 1 <= first <= last <= page_count:
+            raise ValueError(f"Page range '{part.strip()}' is outside pages 1-{page_count}")
+        indexes.update(range(first - 1, last))
+    return sorted(indexes)
+
+def text_blocks(page, scale=1.0, textpage=None):
+    """Text blocks of a page in reading order, with bounding boxes scaled by scale"""
+    return [
+        {"bbox": [round(value * scale, 2) for value in block[:4]], "text": block[4].strip()}
+        for block in page.get_text("blocks", sort=True, textpage=textpage)
+        if block[6] == 0 and block[4].strip()
+    ]
+
+def page_text_record(page, text, blocks, ocr):
+    """NDJSON record of one page"""
+    return {
+        "page": page.number + 1,
+        "ocr": ocr,
+        "width": round(page.rect.width, 2),
+        "height": round(page.rect.height, 2),
+        "text": text,
+        "blocks": blocks
+    }
+
+def count_pdf_pages(content):
+    """Page count of an uploaded PDF that is not password-protected (runs as a job)"""
+    with fitz.open(stream=content, filetype="pdf") as pdf_document:
+        if pdf_document.needs_pass:
+            raise PermissionError("PDF is password-protected")
+        return len(pdf_document)
+
+def read_text_layers(source, page_indexes):
+    """
+    Read the text layers of a batch of pages from one open document (runs as a job)
+
+    Args:
+        source: PDF bytes, or the path of a PDF file
+        page_indexes: 0-based page numbers
+
+    Returns:
+        One entry per page: its NDJSON record, or None if the page has no
+        text layer and needs OCR (same rule as text_layer_pages in /api/analyze)
+    """
+    records = []
+    with open_pdf_source(source) as pdf_document, profile_stage("text"):
+        for page_index in page_indexes:
+            check_cancelled()
+            try:
+                page = pdf_document[page_index]
+                textpage = page.get_textpage()
+                if page_text_coverage(page, textpage) == 0:
+                    records.append(None)
+                    continue
+                records.append(page_text_record(
+                    page, page.get_text(textpage=textpage), text_blocks(page, textpage=textpage), ocr=False
+                ))
+            except Exception as e:
+                # One unreadable page should not fail the batch
+                records.append({"page": page_index + 1, "error": str(e)})
+    return records
+
+def ocr_page_text(source, page_index, language):
+    """
+    OCR one page that has no text layer (runs as a job)
+
+    Returns:
+        The page's NDJSON record; block bounding boxes are in PDF points of
+        the original page
+    """
+    with open_pdf_source(source) as pdf_document:
+        page = pdf_document[page_index]
+        with profile_stage("rasterize"):
+            jpeg_bytes = render_page_jpeg(page)
+        with profile_stage("ocr"):
+            page_pdf = ocr_image_to_pdf(jpeg_bytes, language)
+        with fitz.open(stream=page_pdf, filetype="pdf") as ocr_document:
+            # Tesseract sizes its page from the image resolution
+            ocr_page = ocr_document[0]
+            blocks = text_blocks(ocr_page, scale=page.rect.width / ocr_page.rect.width)
+            return page_text_record(page, ocr_page.get_text(), blocks, ocr=True)
+
+async def stream_page_text(job_id, source, page_indexes, language, temp_path=None):
+    """
+    Yield one NDJSON line per page, in page order, as the jobs finish
+
+    Ends with a summary line, or an error line if the job hit a limit. A
+    client that disconnects mid-stream cancels the remaining pages.
+    """
+    batches = deque(
+        page_indexes[start:start + EXTRACT_TEXT_BATCH_PAGES]
+        for start in range(0, len(page_indexes), EXTRACT_TEXT_BATCH_PAGES)
+    )
+    in_flight = deque()
+    ocr_tasks = {}
+    status = "failed"
+    ocr_pages = 0
+    started_at = time.perf_counter()
+
+    def submit_next_batch():
+        if batches:
+            batch = batches.popleft()
+            in_flight.append((batch, asyncio.ensure_future(
+                run_job(read_text_layers, source, batch, job_id=job_id)
+            )))
+
+    try:
+        for _ in range(EXTRACT_TEXT_BATCHES_IN_FLIGHT):
+            submit_next_batch()
+
+        while in_flight:
+            batch, task = in_flight.popleft()
+            try:
+                records = await task
+            except (JobLimitExceeded, WorkerCrashed) as e:
+                logger.error(f"Text extraction stopped: job {job_id} ({e!r})")
+                # Stop the other batches and OCR pages still running in the pool
+                cancel_job(job_id)
+                yield json.dumps({"error": job_error_response(e).detail}) + "\n"
+                return
+            except Exception as e:
+                records = [{"page": page_index + 1, "error": str(e)} for page_index in batch]
+            submit_next_batch()
+
+            # Pages without a text layer are OCRed in parallel, one job each
+            for page_index, record in zip(batch, records):
+                if record is None:
+                    ocr_tasks[page_index] = asyncio.ensure_future(
+                        run_job(ocr_page_text, source, page_index, language, job_id=job_id)
+                    )
+
+            for page_index, record in zip(batch, records):
+                if record is None:
+                    try:
+                        record = await ocr_tasks.pop(page_index)
+                    except (JobLimitExceeded, WorkerCrashed) as e:
+                        logger.error(f"Text extraction stopped: job {job_id} ({e!r})")
+                        cancel_job(job_id)
+                        yield json.dumps({"error": job_error_response(e).detail}) + "\n"
+                        return
+                    except Exception as e:
+                        # One unreadable page should not end the stream
+                        record = {"page": page_index + 1, "error": str(e)}
+                ocr_pages += 1 if record.get("ocr") else 0
+                yield json.dumps(record) + "\n"
+
+        status = "done"
+        yield json.dumps({
+            "done": True,
+            "pages": len(page_indexes),
+            "ocr_pages": ocr_pages,
+            "seconds": round(time.perf_counter() - started_at, 3)
+        }) + "\n"
+
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        cancel_job(job_id)
+        logger.info(f"Client disconnected, cancelled text extraction job {job_id}")
+        raise
+
+    finally:
+        for task in [task for _, task in in_flight] + list(ocr_tasks.values()):
+            task.cancel()
+        finish_job(job_id, status)
+        cleanup_temp_files(temp_path)
+
+@app.post("/api/extract-text")
+async def extract_text(
+    file: UploadFile = File(...),
+    pages: str = Form(""),
+    language: str = Form("eng")
+):
+    """
+    Extract text page by page as a stream of NDJSON records
+
+    Pages with a text layer are read directly; pages without one are OCRed.
+    Each record is sent as soon as its page (and every page before it) is
+    done.
+
+    Args:
+        file: PDF file to extract text from
+        pages: Pages to extract, e.g. "1-3,5,8-" (default: all pages)
+        language: OCR language code for pages without a text layer
+
+    Returns:
+        application/x-ndjson stream: one record per page with page, ocr,
+        width, height, text and blocks (bbox in PDF points, text), then a
+        summary record with done, pages, ocr_pages and seconds
+    """
+    # Validate file type
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+
+    MAX_FILE_SIZE = 50 * 1024 * 1024  # Same limit as /api/ocr
+    logger.info(f"Extracting text: {file.filename} (pages: {pages or 'all'}, language: {language})")
+
+    content = await file.read()
+
+    if len(content) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
+
+    try:
+        page_count = await run_job(count_pdf_pages, content)
+    except PermissionError:
+        raise HTTPException(status_code=400, detail="Password-protected PDFs are not supported")
+    except (JobLimitExceeded, WorkerCrashed) as e:
+        logger.error(f"Text extraction stopped: {file.filename} ({e!r})")
+        raise job_error_response(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read PDF: {str(e)}")
+
+    try:
+        page_indexes = parse_page_ranges(pages, page_count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    annotate_profile(page_count=len(page_indexes))
+
+    # Each job opens the document itself: small files travel with the job,
+    # larger ones are read from a temp file
+    source = content
+    temp_path = None
+    if len(content) > INMEMORY_MAX_BYTES:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as pdf_temp:
+            pdf_temp.write(content)
+            source = temp_path = pdf_temp.name
+
+    job_id = start_job("extract_text")
+    return StreamingResponse(
+        stream_page_text(job_id, source, page_indexes, language, temp_path),
+        media_type="application/x-ndjson",
+        headers={"X-Page-Count": str(len(page_indexes))}
+    )
+
 def cleanup_temp_files(*file_paths):
-    """Clean up temporary files"""
+    """Clean up temporary files (None entries are skipped)"""
     for file_path in file_paths:
         try:
-            if os.path.exists(file_path):
+            if file_path is not None and os.path.exists(file_path):
                 os.unlink(file_path)
                 logger.info(f"Cleaned up: {file_path}")
         except Exception as e:
@@ -609,6 +2952,66 @@ async def health_check():
     """Health check for monitoring"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Counters and running jobs, aggregated over all worker processes"""
+    running_jobs = dict(get_state_db().execute(
+        "SELECT operation, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY operation"
+    ))
+    return {
+        "worker_pid": os.getpid(),
+        "counters": get_counters(),
+        "running_jobs": running_jobs
+    }
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Dependency for admin endpoints"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """List stored request profiles, newest first"""
+    profiles = []
+    for profile_path in sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), reverse=True):
+        try:
+            with open(profile_path) as f:
+                profiles.append(json.load(f)["metadata"])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Unreadable profile {profile_path}: {e}")
+    return {"profiles": profiles}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: str, format: str = "speedscope"):
+    """
+    Download a stored profile
+
+    Args:
+        profile_id: Id from the listing or the X-Profile-Id response header
+        format: "speedscope" (JSON, open at https://www.speedscope.app) or
+            "collapsed" (one "frame;frame;frame count" line per stack, for flamegraph.pl)
+    """
+    if not re.fullmatch(r"[\w-]+", profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    profile_path = os.path.join(PROFILE_DIR, f"{profile_id}.json")
+    if not os.path.exists(profile_path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "collapsed":
+        with open(profile_path) as f:
+            speedscope = json.load(f)
+        frames = speedscope["shared"]["frames"]
+        sampled = speedscope["profiles"][0]
+        interval_ms = speedscope["metadata"]["interval_ms"]
+        lines = [
+            ";".join(frames[index]["name"] for index in sample) + f" {round(weight / interval_ms)}"
+            for sample, weight in zip(sampled["samples"], sampled["weights"])
+        ]
+        return PlainTextResponse("\n".join(lines) + "\n")
+
+    return FileResponse(path=profile_path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
 @app.get("/test-ocr")
 async def test_ocr_dependencies():
     """Test OCR dependencies are installed correctly"""